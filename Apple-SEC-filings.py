@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+# Starts the secfilings package, so the program can still be run by opening
+# this file or with "python Apple-SEC-filings.py". See secfilings/__init__.py
+# for what it does.
+
+from secfilings.cli import main
+
+if __name__ == "__main__":
+    main()
+
+# End of script
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+
+# benchmark.py: Measures how quickly the secfilings package gets through a
+# corpus of 10-K-shaped reports, without going anywhere near
+# investor.apple.com. The corpus is generated from a fixed seed (so every
+# run sees exactly the same HTML) or read from a folder of saved reports,
+# and served from a web server on 127.0.0.1 while the whole pipeline runs
+# against it in three modes:
+#
+#   serial    an empty cache and one process
+#   parallel  an empty cache and --jobs worker processes
+#   cached    the serial run's cache with its job ledger removed, so every
+#             report is read from the cache and only the outputs are rebuilt
+#
+# For each mode the end-to-end latency (starting the program included), the
+# peak memory use and the throughput of each stage of the run (from the run
+# report written with --report) are printed and saved as JSON. The results
+# are compared with a saved baseline, and the script exits with status 1 if
+# any of them got noticeably worse or if the reports' word counts changed.
+# Run it with --save-baseline to record a new baseline.
+#
+# Usage: python benchmarks/benchmark.py [--filings N] [--quick] [--help]
+
+import argparse, csv, functools, glob, http.server, json, os, platform, \
+       random, re, shutil, subprocess, sys, tempfile, threading, time
+
+# The folder holding the secfilings package, and the baseline kept next to
+# this script
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+defaultBaseline = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               "baseline.json")
+
+# Words used to fill the generated reports, roughly in order of how often
+# they turn up in real Risk Factors sections. Nouns are sometimes made
+# plural and verbs given an ending so the lemmatizer has some work to do.
+nouns = ("company product risk market business result operation customer "
+         "competition price demand supply component service supplier cost "
+         "condition change revenue margin law regulation tax investment "
+         "security breach network system data partner manufacturer "
+         "carrier retailer channel inventory currency rate litigation "
+         "patent property right claim government country economy growth "
+         "consumer technology software hardware device application content "
+         "developer employee executive facility disruption event quarter "
+         "year period forecast estimate credit liquidity obligation "
+         "agreement contract license warranty defect quality outsourcing "
+         "distribution store reseller capital marketplace platform "
+         "infrastructure privacy reputation brand innovation volatility "
+         "exchange commission authority jurisdiction dispute settlement "
+         "penalty fine earthquake disaster pandemic terrorism war").split()
+verbs = ("affect depend compete increase decrease reduce require rely "
+         "expect continue face experience introduce develop manufacture "
+         "sell distribute impact harm adversely result fluctuate delay "
+         "limit obtain protect infringe restrict subject incur maintain "
+         "attract retain manage expand acquire integrate comply change "
+         "disrupt interrupt exceed decline vary").split()
+others = ("the of and to in a or our that could be may for its with as "
+          "not by on are is which other such these from an have if any "
+          "material significant future certain new additional international "
+          "global financial economic competitive adverse substantial "
+          "unable able successfully ability including also there can no "
+          "assurance timely effectively").split()
+
+# makeWordPicker(): Returns a function that picks a word at random, with
+# common words far more likely than rare ones
+def makeWordPicker(rng):
+    vocabulary = []
+    for rank, word in enumerate(others):
+        vocabulary.append((word, "", 12.0 / (rank + 1)))
+    for rank, word in enumerate(nouns):
+        vocabulary.append((word, "noun", 4.0 / (rank + 1)))
+    for rank, word in enumerate(verbs):
+        vocabulary.append((word, "verb", 3.0 / (rank + 1)))
+    words = [w for w, kind, weight in vocabulary]
+    kinds = dict((w, kind) for w, kind, weight in vocabulary)
+    cumulative = []
+    total = 0.0
+    for w, kind, weight in vocabulary:
+        total = total + weight
+        cumulative.append(total)
+
+    def pick():
+        word = rng.choices(words, cum_weights=cumulative)[0]
+        kind = kinds[word]
+        if kind == "noun" and rng.random() < 0.4:
+            word = word + ("es" if word.endswith(("s", "x", "ch")) else "s")
+        elif kind == "verb" and rng.random() < 0.5:
+            ending = rng.choice(("s", "ed", "ing"))
+            if word.endswith("e") and ending != "s":
+                word = word[:-1]
+            word = word + ending
+        return word
+    return pick
+
+# Headings of a 10-K, in order, with the page each one starts on
+reportItems = (
+    ("PART I", None, 1), ("Item 1.", "Business", 1),
+    ("Item 1A.", "Risk Factors", 8),
+    ("Item 1B.", "Unresolved Staff Comments", 17),
+    ("Item 2.", "Properties", 17), ("Item 3.", "Legal Proceedings", 18),
+    ("Item 4.", "Mine Safety Disclosures", 18), ("PART II", None, 19),
+    ("Item 5.", "Market for Registrant's Common Equity, Related " +
+     "Stockholder Matters and Issuer Purchases of Equity Securities", 19),
+    ("Item 6.", "Selected Financial Data", 21),
+    ("Item 7.", "Management's Discussion and Analysis of Financial " +
+     "Condition and Results of Operations", 22),
+    ("Item 7A.", "Quantitative and Qualitative Disclosures About Market " +
+     "Risk", 36),
+    ("Item 8.", "Financial Statements and Supplementary Data", 38),
+    ("Item 9.", "Changes in and Disagreements with Accountants on " +
+     "Accounting and Financial Disclosure", 70),
+    ("Item 9A.", "Controls and Procedures", 70),
+    ("Item 9B.", "Other Information", 72))
+
+# generateReport(): Returns the HTML of a made-up annual report. It has a
+# table of contents, a Risk Factors section of the given number of
+# paragraphs, sections of prose before and after it and a few tables of
+# figures, laid out the way the EDGAR filings are.
+def generateReport(rng, company, year, paragraphs):
+    pick = makeWordPicker(rng)
+
+    def sentence(length):
+        words = [pick() for _ in range(length)]
+        words[0] = words[0].capitalize()
+        return " ".join(words) + rng.choice((".", ".", ".", ";"))
+
+    def paragraph(sentences):
+        return "<p style=\"margin-top:6pt\"><font size=\"2\">" + \
+               " ".join(sentence(rng.randint(8, 30))
+                        for _ in range(sentences)) + "</font></p>"
+
+    def figures(rows):
+        lines = ["<table cellspacing=\"0\" cellpadding=\"0\">"]
+        for row in range(rows):
+            lines.append("<tr><td><font size=\"1\">" + pick().capitalize() +
+                         " " + pick() + "</font></td>" +
+                         "".join("<td align=\"right\">$&#160;%s</td>" %
+                                 format(rng.randint(100, 99999999), ",")
+                                 for _ in range(3)) + "</tr>")
+        lines.append("</table>")
+        return "\n".join(lines)
+
+    html = ["<html><head><title>" + company + " 10-K " + str(year) +
+            "</title><meta http-equiv=\"Content-Type\" content=\"text/html; " +
+            "charset=utf-8\"><style>p { margin: 0 }</style>" +
+            "<script>var page = 1;</script></head><body>",
+            "<p align=\"center\"><b>UNITED STATES SECURITIES AND EXCHANGE " +
+            "COMMISSION</b></p>", "<p align=\"center\">FORM 10-K</p>",
+            "<p>" + company + "</p>", "<p>Fiscal year ended September " +
+            str(rng.randint(24, 30)) + ", " + str(year) + "</p>"]
+    # Table of contents: the Risk Factors line here is followed by a page
+    # number, which is how the extractor knows it isn't the real section
+    html.append("<table>")
+    for item, title, page in reportItems:
+        if title is None:
+            html.append("<tr><td colspan=\"3\">\n" + item + "\n</td></tr>")
+        else:
+            html.append("<tr>\n<td>\n" + item + "\n</td>\n<td>\n" + title +
+                        "\n</td>\n<td>\n" + str(page) + "\n</td>\n</tr>")
+    html.append("</table>")
+    for item, title, page in reportItems:
+        if title is None:
+            html.append("<p align=\"center\"><b>" + item + "</b></p>")
+            continue
+        html.append("<p><b>" + item + "&#160;&#160;&#160;&#160;" + title +
+                    "</b></p>")
+        if title == "Risk Factors":
+            for n in range(paragraphs):
+                if n % 6 == 0:
+                    html.append("<p><b><i>" + sentence(rng.randint(8, 16)) +
+                                "</i></b></p>")
+                html.append(paragraph(rng.randint(2, 6)))
+        elif title == "Unresolved Staff Comments":
+            html.append("<p>None.</p>")
+        else:
+            for n in range(max(1, paragraphs // 4)):
+                html.append(paragraph(rng.randint(2, 6)))
+            if item in ("Item 6.", "Item 7.", "Item 8."):
+                html.append(figures(paragraphs // 2))
+        html.append("<p align=\"center\">" + str(page) + "</p><hr>")
+    html.append("</body></html>")
+    return "\n".join(html)
+
+# generateCorpus(): Writes a corpus of made-up reports to folder and returns
+# them as (cik, filing_id, year, file name) tuples. The same seed always
+# gives the same reports.
+def generateCorpus(folder, filings, paragraphs, seed):
+    rng = random.Random(seed)
+    companies = [("%07d" % rng.randint(1000000, 1999999),
+                  "Example Company " + str(n)) for n in range(10)]
+    corpus = []
+    for n in range(filings):
+        cik, company = companies[n % len(companies)]
+        year = 2007 + (n // len(companies)) % 9
+        filingID = "%07d-%02d-%06d" % (rng.randint(1000000, 1999999),
+                                       year % 100, n)
+        name = cik + "-" + filingID + ".htm"
+        with open(os.path.join(folder, name), "w", -1, "utf-8") as file:
+            file.write(generateReport(rng, company, year, paragraphs))
+        corpus.append((cik, filingID, year, name))
+    return corpus
+
+# readCorpus(): Lists the reports saved in a folder as (cik, filing_id,
+# year, file name) tuples. A manifest.csv in the folder, with cik,
+# filing_id, year and file columns, says which is which. Otherwise every
+# .htm or .html file is a report, and its year is the first four-digit
+# number in its name (or counts up from 2007).
+def readCorpus(folder):
+    manifest = os.path.join(folder, "manifest.csv")
+    if os.path.exists(manifest):
+        with open(manifest, newline="", encoding="utf-8") as file:
+            return [(row["cik"], row["filing_id"], int(row["year"]),
+                     row["file"]) for row in csv.DictReader(file)]
+    corpus = []
+    names = sorted(os.path.basename(path) for path in
+                   glob.glob(os.path.join(folder, "*.htm")) +
+                   glob.glob(os.path.join(folder, "*.html")))
+    for n, name in enumerate(names):
+        match = re.search(r"(?<![0-9])(19|20)[0-9]{2}(?![0-9])", name)
+        year = int(match.group()) if match else 2007 + n
+        corpus.append(("0", os.path.splitext(name)[0], year, name))
+    return corpus
+
+# CorpusHandler: Serves the corpus files, quietly
+class CorpusHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+# serveCorpus(): Starts a web server for the corpus on a free port of
+# 127.0.0.1 and returns it
+def serveCorpus(folder):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(CorpusHandler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# writeManifest(): Writes the manifest the pipeline is run with
+def writeManifest(path, corpus, port):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["cik", "filing_id", "year", "url"])
+        for cik, filingID, year, name in corpus:
+            writer.writerow([cik, filingID, year, "http://127.0.0.1:" +
+                             str(port) + "/" + name])
+
+# runPipeline(): Runs the whole pipeline once in a new process and returns
+# its end-to-end latency along with its run report
+def runPipeline(workDir, manifest, cacheDir, jobs, extra=()):
+    report = os.path.join(workDir, "report.json")
+    command = [sys.executable, "-m", "secfilings", "run",
+               "--manifest", manifest, "--cache-dir", cacheDir,
+               "--host-delay", "0", "--connections", "8",
+               "--jobs", str(jobs), "--xlsx",
+               os.path.join(workDir, "benchmark.xlsx"),
+               "--report", report] + list(extra)
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = repoRoot + os.pathsep + \
+                                environment.get("PYTHONPATH", "")
+    started = time.perf_counter()
+    subprocess.run(command, cwd=workDir, env=environment, check=True,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    latency = time.perf_counter() - started
+    with open(report, encoding="utf-8") as file:
+        return latency, json.load(file)
+
+# summarize(): Boils a run report down to the numbers the benchmark keeps.
+# A stage's throughput is the number of reports divided by the time spent
+# in it, which with several workers is their combined time; the stages that
+# read HTML also get megabytes per second.
+def summarize(latency, report):
+    processed = report["processed"]
+    htmlMB = report["counts"].get("html_bytes", 0) / 1024 / 1024
+    stages = dict()
+    for stage, seconds in sorted(report["stages"].items()):
+        stages[stage] = {"seconds": seconds,
+                         "filings_per_second": processed / seconds
+                                               if seconds else None}
+        if stage in ("parse", "normalize", "scan") and htmlMB:
+            stages[stage]["mb_per_second"] = htmlMB / seconds \
+                                             if seconds else None
+    return {"latency_seconds": latency,
+            "run_seconds": report["seconds"],
+            "filings_per_second": processed / report["seconds"],
+            "processed": processed,
+            "failed": report["failed"],
+            "peak_memory_mb": report["peak_memory_mb"],
+            "stages": stages,
+            "counts": report["counts"]}
+
+# benchmark(): Runs the pipeline in each mode, counting the given sections
+# and keeping the fastest of a number of repeats, and returns the results
+def benchmark(corpus, corpusDir, workDir, jobs, sections, repeats):
+    server = serveCorpus(corpusDir)
+    manifest = os.path.join(workDir, "manifest.csv")
+    writeManifest(manifest, corpus, server.server_address[1])
+    modes = dict()
+    try:
+        for mode in ("serial", "parallel", "cached"):
+            best = None
+            for repeat in range(repeats):
+                if mode == "cached":
+                    cacheDir = os.path.join(workDir, "serial-cache")
+                    os.remove(os.path.join(cacheDir, "ledger.sqlite"))
+                    latency, report = runPipeline(workDir, manifest,
+                                                  cacheDir, 1, ["--offline",
+                                                  "--sections", sections])
+                else:
+                    cacheDir = os.path.join(workDir, mode + "-cache")
+                    shutil.rmtree(cacheDir, ignore_errors=True)
+                    latency, report = runPipeline(
+                        workDir, manifest, cacheDir,
+                        jobs if mode == "parallel" else 1,
+                        ["--sections", sections])
+                if best is None or latency < best[0]:
+                    best = (latency, report)
+                print("%-8s run %d of %d: %.2f seconds" %
+                      (mode, repeat + 1, repeats, latency))
+            modes[mode] = summarize(*best)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return modes
+
+# printResults(): Prints the results as two small tables
+def printResults(results):
+    modes = results["modes"]
+    print("\n%-10s %10s %10s %10s %10s" % ("Mode", "Latency", "Filings/s",
+                                          "Peak MB", "Workers MB"))
+    for mode, result in modes.items():
+        memory = result["peak_memory_mb"]
+        print("%-10s %9.2fs %10.1f %10s %10s" %
+              (mode, result["latency_seconds"], result["filings_per_second"],
+               "%.1f" % memory["main"] if memory["main"] else "-",
+               "%.1f" % memory["workers"] if memory["workers"] else "-"))
+    print("\nStage throughput in filings per second " +
+          "(MB of HTML per second):")
+    stages = sorted(set(stage for result in modes.values()
+                        for stage in result["stages"]))
+    print("%-10s" % "Stage" + "".join("%22s" % mode for mode in modes))
+    for stage in stages:
+        cells = []
+        for result in modes.values():
+            numbers = result["stages"].get(stage)
+            if numbers is None or numbers["filings_per_second"] is None:
+                cells.append("%22s" % "-")
+                continue
+            cell = "%.1f" % numbers["filings_per_second"]
+            if numbers.get("mb_per_second"):
+                cell = cell + " (%.1f)" % numbers["mb_per_second"]
+            cells.append("%22s" % cell)
+        print("%-10s" % stage + "".join(cells))
+
+# compareResults(): Compares the results with a baseline and returns a list
+# of what got worse. A time or memory figure has regressed when it is more
+# than tolerance (a fraction) above the baseline and also more than minimum
+# seconds or megabytes above it, so stages that take next to no time don't
+# raise false alarms. The word counts must match exactly. The parallel mode
+# is only compared when it ran the same number of jobs.
+def compareResults(results, baseline, tolerance, minimum):
+    problems = []
+
+    def check(name, value, old, unit):
+        if value is None or old is None:
+            return
+        if value > old * (1 + tolerance) and value - old > minimum:
+            problems.append("%s: %.2f%s, baseline %.2f%s (+%.0f%%)" %
+                            (name, value, unit, old, unit,
+                             (value / old - 1) * 100 if old else 0))
+
+    for mode, result in results["modes"].items():
+        old = baseline["modes"].get(mode)
+        if old is None or (mode == "parallel" and
+                           results["jobs"] != baseline["jobs"]):
+            continue
+        check(mode + " latency", result["latency_seconds"],
+              old["latency_seconds"], "s")
+        for stage, numbers in result["stages"].items():
+            if stage in old["stages"]:
+                check(mode + " " + stage + " stage", numbers["seconds"],
+                      old["stages"][stage]["seconds"], "s")
+        check(mode + " peak memory", result["peak_memory_mb"]["main"],
+              old["peak_memory_mb"]["main"], " MB")
+        for name in ("tokens", "distinct_words", "section_lines"):
+            if result["counts"].get(name) != old["counts"].get(name):
+                problems.append("%s %s changed from %s to %s" %
+                                (mode, name, old["counts"].get(name),
+                                 result["counts"].get(name)))
+        if result["failed"]:
+            problems.append(mode + ": " + str(result["failed"]) +
+                            " filing(s) failed")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the secfilings pipeline on a local corpus " +
+                    "of 10-K-shaped reports.")
+    parser.add_argument("--filings", type=int, default=200,
+                        help="number of reports to generate (default: 200)")
+    parser.add_argument("--paragraphs", type=int, default=120,
+                        help="paragraphs in each generated Risk Factors " +
+                             "section (default: 120)")
+    parser.add_argument("--seed", type=int, default=10,
+                        help="seed for generating the corpus (default: 10)")
+    parser.add_argument("--corpus", metavar="FOLDER",
+                        help="use the reports saved in this folder instead " +
+                             "of generating them")
+    parser.add_argument("--sections", default="1A", metavar="ITEMS",
+                        help="sections to count, as for \"run --sections\" " +
+                             "(default: 1A)")
+    parser.add_argument("--quick", action="store_true",
+                        help="a quick run over 20 generated reports")
+    parser.add_argument("--jobs", type=int,
+                        default=max(2, min(4, os.cpu_count() or 1)),
+                        help="worker processes for the parallel mode " +
+                             "(default: one per CPU, from 2 to 4)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="run each mode this many times and keep the " +
+                             "fastest (default: 1)")
+    parser.add_argument("--output", default="benchmark-results.json",
+                        metavar="FILE",
+                        help="file to save the results to " +
+                             "(default: benchmark-results.json)")
+    parser.add_argument("--baseline", default=defaultBaseline, metavar="FILE",
+                        help="baseline to compare with (default: " +
+                             "benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="save these results as the new baseline " +
+                             "instead of comparing with it")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="how much worse than the baseline (as a " +
+                             "fraction) a figure may get before it counts " +
+                             "as a regression (default: 0.25)")
+    parser.add_argument("--minimum", type=float, default=0.1,
+                        help="ignore differences smaller than this many " +
+                             "seconds or megabytes (default: 0.1)")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the corpus, caches and outputs instead " +
+                             "of deleting them")
+    args = parser.parse_args()
+    if args.quick:
+        args.filings = 20
+    if args.filings < 1 or args.paragraphs < 1 or args.repeat < 1:
+        parser.error("--filings, --paragraphs and --repeat must be at " +
+                     "least 1")
+    if args.jobs < 2:
+        parser.error("--jobs must be at least 2")
+
+    workDir = tempfile.mkdtemp(prefix="secfilings-benchmark-")
+    try:
+        if args.corpus:
+            corpusDir = os.path.abspath(args.corpus)
+            corpus = readCorpus(corpusDir)
+            description = {"folder": corpusDir, "filings": len(corpus)}
+            if not corpus:
+                print("Error: There are no reports in " + args.corpus + ".")
+                sys.exit(1)
+        else:
+            corpusDir = os.path.join(workDir, "corpus")
+            os.mkdir(corpusDir)
+            started = time.perf_counter()
+            corpus = generateCorpus(corpusDir, args.filings, args.paragraphs,
+                                    args.seed)
+            description = {"filings": args.filings,
+                           "paragraphs": args.paragraphs, "seed": args.seed}
+            print("Generated " + str(len(corpus)) + " reports in %.1f " %
+                  (time.perf_counter() - started) + "seconds.")
+        description["megabytes"] = sum(
+            os.path.getsize(os.path.join(corpusDir, name))
+            for cik, filingID, year, name in corpus) / 1024 / 1024
+        results = {"corpus": description, "sections": args.sections,
+                   "jobs": args.jobs,
+                   "machine": {"python": platform.python_version(),
+                               "platform": platform.platform(),
+                               "cpus": os.cpu_count()},
+                   "modes": benchmark(corpus, corpusDir, workDir, args.jobs,
+                                      args.sections, args.repeat)}
+    finally:
+        if args.keep:
+            print("Benchmark files kept in " + workDir + ".")
+        else:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+    printResults(results)
+    path = args.baseline if args.save_baseline else args.output
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=1)
+        file.write("\n")
+    print("\nResults saved to " + path + ".")
+    if args.save_baseline:
+        return
+    if not os.path.exists(args.baseline):
+        print("There is no baseline to compare with yet; save one with " +
+              "--save-baseline.")
+        return
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    if baseline["corpus"] != description or \
+            baseline["sections"] != args.sections:
+        print("The baseline was measured on a different corpus or " +
+              "sections, so the results weren't compared with it.")
+        return
+    if baseline["machine"] != results["machine"]:
+        print("Note: The baseline was measured on a different machine " +
+              "(" + baseline["machine"]["platform"] + ", Python " +
+              baseline["machine"]["python"] + ").")
+    problems = compareResults(results, baseline, args.tolerance, args.minimum)
+    if problems:
+        print("Regressions compared with the baseline:")
+        for problem in problems:
+            print("\t" + problem)
+        sys.exit(1)
+    print("No regressions compared with the baseline.")
+
+if __name__ == "__main__":
+    main()
+
+# End of script
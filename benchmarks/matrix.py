@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# matrix.py: Times building a TermMatrix and querying it as the number of
+# filings grows, against working the same answers out from the filings'
+# word count dictionaries each time, and checks that both give the same
+# words rising and falling the most. The filings' word counts are drawn
+# from a Zipf distribution with a fixed seed, spread over ten years.
+#
+# Usage: python benchmarks/matrix.py [--filings N,N,...] [--words N]
+#                                    [--repeats N]
+
+import argparse, os, random, sys, time
+
+# The folder holding the secfilings package
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repoRoot)
+
+from secfilings.count import TermMatrix, compareCounts
+from secfilings.fetch import Filing
+
+# How many words are asked for in each query, as in the trend report
+queryWords = 25
+
+# filingCounts(): Makes up the word counts of some filings, each using a few
+# thousand of the given number of words
+def filingCounts(rng, filings, words):
+    vocabulary = ["w%06d" % n for n in range(words)]
+    weights = [1 / (n + 1) ** 1.1 for n in range(words)]
+    pool = []
+    for n in range(min(filings, 50)):
+        d = dict()
+        for word in rng.choices(vocabulary, weights, k=20000):
+            d[word] = d.get(word, 0) + 1
+        pool.append(d)
+    return [(Filing("c" + str(n % 20), "f" + str(n), 2000 + n % 10, ""),
+             pool[n % len(pool)]) for n in range(filings)]
+
+# timed(): Calls a function several times and returns the fewest seconds
+# it took and what it returned the last time
+def timed(repeats, function, *args):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+# buildMatrix(): Adds every filing to a new TermMatrix and builds it
+def buildMatrix(filings):
+    matrix = TermMatrix()
+    for filing, d in filings:
+        matrix.add(filing, d)
+    matrix.build()
+    return matrix
+
+# queryMatrix(): The queries the trend report makes of a matrix
+def queryMatrix(matrix, fromYear, toYear):
+    return (matrix.risers(fromYear, toYear, queryWords),
+            matrix.fallers(fromYear, toYear, queryWords),
+            matrix.frequencies())
+
+# queryDictionaries(): The risers and fallers worked out from the word
+# count dictionaries, adding up each year's filings first
+def queryDictionaries(filings, fromYear, toYear):
+    totals = {fromYear: dict(), toYear: dict()}
+    for filing, d in filings:
+        if filing.year in totals:
+            total = totals[filing.year]
+            for word, n in d.items():
+                total[word] = total.get(word, 0) + n
+    return compareCounts(totals[fromYear], totals[toYear], queryWords)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time building and querying a TermMatrix as the number " +
+                    "of filings grows.")
+    parser.add_argument("--filings", default="10,100,1000",
+                        help="comma-separated numbers of filings to try " +
+                             "(default: 10,100,1000)")
+    parser.add_argument("--words", type=int, default=40000,
+                        help="number of distinct words the filings are " +
+                             "drawn from (default: 40000)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="number of timed tries of each step; the " +
+                             "fastest counts (default: 3)")
+    args = parser.parse_args()
+    try:
+        sizes = [int(n) for n in args.filings.split(",")]
+    except ValueError:
+        parser.error("--filings must be a list of whole numbers")
+    if min(sizes) < 10:
+        parser.error("--filings must be at least 10, one for each year")
+    try:
+        TermMatrix()
+    except ImportError as e:
+        print("Error: The benchmark needs NumPy and SciPy (" + str(e) + ").")
+        sys.exit(1)
+    print("%8s %10s %10s %12s %10s %12s" %
+          ("filings", "words", "build", "query", "tfidf", "from dicts"))
+    rng = random.Random(20171213)
+    for size in sizes:
+        filings = filingCounts(rng, size, args.words)
+        build, matrix = timed(args.repeats, buildMatrix, filings)
+        query, (risers, fallers, shares) = timed(args.repeats, queryMatrix,
+                                                 matrix, 2000, 2009)
+        tfidf, weights = timed(args.repeats, matrix.tfidf)
+        fromDicts, answer = timed(args.repeats, queryDictionaries, filings,
+                                  2000, 2009)
+        print("%8d %10d %9.1fms %10.2fms %8.1fms %10.1fms" %
+              (size, len(matrix.words), build * 1000, query * 1000,
+               tfidf * 1000, fromDicts * 1000))
+        if answer != (risers, fallers):
+            print("Error: The matrix and the dictionaries disagree about " +
+                  "the words rising and falling the most.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+# End of script
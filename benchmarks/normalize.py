@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# normalize.py: Times normalizeLine() against the step-by-step clean-up it
+# replaced, on the lines of generated reports (the same ones benchmark.py
+# serves) or of saved reports in a folder, and checks that both give the
+# same result for every line.
+#
+# Usage: python benchmarks/normalize.py [--corpus FOLDER] [--repeats N]
+
+import argparse, glob, os, random, re, sys, tempfile, time
+
+# The folder holding the secfilings package
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repoRoot)
+
+from secfilings.extract import normalizeLine, pageText, textLines
+
+# originalNormalizeLine(): The step-by-step clean-up the program did before
+# normalizeLine() replaced it
+def originalNormalizeLine(line):
+    line = re.sub(r'[\u2002\u2003\u2007\u2008\u2009\u200A\u00A0/]', ' ', line)
+    line = line.strip()
+    line = re.sub(r'[\u2012\u2013\u2014\u2015\u2053]', '-', line)
+    line = "".join(c for c in line if c not in
+                   '!"#$%&\'()*+,./:;<=>?@[\\]^_`{|}~')
+    return "".join(c for c in line if ord(c) < 128)
+
+# reportLines(): Returns the non-blank lines of the text of some reports,
+# either those in folder or a few generated ones
+def reportLines(folder):
+    if folder:
+        paths = sorted(glob.glob(os.path.join(folder, "*.htm")) +
+                       glob.glob(os.path.join(folder, "*.html")))
+    else:
+        from benchmark import generateReport
+        rng = random.Random(20171208)
+        paths = []
+        for n in range(5):
+            file = tempfile.NamedTemporaryFile("w", encoding="utf-8",
+                                               suffix=".htm", delete=False)
+            with file:
+                file.write(generateReport(rng, "Example Company", 2007 + n,
+                                          150))
+            paths.append(file.name)
+    lines = []
+    for path in paths:
+        lines.extend(line for line in textLines(pageText(path))
+                     if line.strip())
+        if not folder:
+            os.remove(path)
+    return lines
+
+# timePerLine(): The fewest microseconds per line a clean-up function took
+# over all the lines, out of several tries
+def timePerLine(function, lines, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for line in lines:
+            function(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(lines) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time normalizeLine() against the clean-up it replaced.")
+    parser.add_argument("--corpus", metavar="FOLDER",
+                        help="use the .htm and .html reports in this folder " +
+                             "instead of generated ones")
+    parser.add_argument("--repeats", type=int, default=5,
+                        help="number of timed passes over the lines; the " +
+                             "fastest counts (default: 5)")
+    args = parser.parse_args()
+    lines = reportLines(args.corpus)
+    if not lines:
+        print("Error: There are no report lines to time.")
+        sys.exit(1)
+    different = [line for line in lines
+                 if normalizeLine(line) != originalNormalizeLine(line)]
+    before = timePerLine(originalNormalizeLine, lines, args.repeats)
+    after = timePerLine(normalizeLine, lines, args.repeats)
+    print("%d lines: %.2f us/line before, %.2f us/line after (%.1fx)." %
+          (len(lines), before, after, before / after))
+    if different:
+        print("Error: " + str(len(different)) + " lines came out " +
+              "differently, such as " + repr(different[0]) + ".")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+# End of script
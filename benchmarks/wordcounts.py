@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# wordcounts.py: Compares keeping word counts in dictionaries with keeping
+# them in WordCounts arrays numbered by a shared Vocabulary: the memory
+# each takes for per-year totals and per-filing counts, and how quickly
+# filings are merged into a total and its top words found. Checks that both
+# give the same totals. The filings' word counts are made up from a fixed
+# seed.
+#
+# Usage: python benchmarks/wordcounts.py [--filings N] [--words N]
+#                                        [--years N] [--repeats N]
+
+import argparse, os, random, sys, time, tracemalloc
+
+# The folder holding the secfilings package
+repoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repoRoot)
+
+from secfilings.count import Vocabulary, WordCounts, topWords
+
+# filingCounts(): Makes up the word counts of some filings, each using a
+# tenth of the given number of words
+def filingCounts(rng, filings, words):
+    vocabulary = ["term%06d" % n for n in range(words)]
+    return [dict((word, rng.randint(1, 50))
+                 for word in rng.sample(vocabulary, words // 10))
+            for n in range(filings)]
+
+# allocated(): How many bytes a function's result takes up, and the result
+def allocated(function, *args):
+    tracemalloc.start()
+    result = function(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+# timed(): The fewest seconds a function took out of several tries, and
+# what it returned the last time
+def timed(repeats, function, *args):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+# The two ways of adding up filings' word counts, one total per group
+def dictTotals(groups):
+    totals = []
+    for group in groups:
+        total = dict()
+        for d in group:
+            for word, n in d.items():
+                total[word] = total.get(word, 0) + n
+        totals.append(total)
+    return totals
+
+def arrayTotals(groups):
+    vocabulary = Vocabulary()
+    totals = []
+    for group in groups:
+        total = WordCounts(vocabulary)
+        for d in group:
+            total.add(d)
+        totals.append(total)
+    return totals
+
+# The two ways of keeping each filing's own counts
+def filingDicts(filings):
+    return [dict(d) for d in filings]
+
+def filingArrays(filings):
+    vocabulary = Vocabulary()
+    result = []
+    for d in filings:
+        counts = WordCounts(vocabulary)
+        counts.add(d)
+        result.append(counts)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare word counts kept in dictionaries with word " +
+                    "counts kept in WordCounts arrays.")
+    parser.add_argument("--filings", type=int, default=200,
+                        help="number of filings (default: 200)")
+    parser.add_argument("--words", type=int, default=30000,
+                        help="number of distinct words the filings are " +
+                             "drawn from (default: 30000)")
+    parser.add_argument("--years", type=int, default=10,
+                        help="number of years the filings are spread over " +
+                             "(default: 10)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="number of timed tries of each step; the " +
+                             "fastest counts (default: 3)")
+    args = parser.parse_args()
+    if args.filings < 1 or args.years < 1 or args.words < 10:
+        parser.error("--filings and --years must be at least 1 and " +
+                     "--words at least 10")
+    filings = filingCounts(random.Random(20171215), args.filings, args.words)
+    years = [filings[year::args.years] for year in range(args.years)]
+
+    print(str(args.filings) + " filings of " + str(args.words // 10) +
+          " words each, drawn from " + str(args.words) + " words, over " +
+          str(args.years) + " years")
+    dictBytes, totals = allocated(dictTotals, years)
+    arrayBytes, arrays = allocated(arrayTotals, years)
+    print("%-28s %13s %13s" % ("", "dictionaries", "WordCounts"))
+    print("%-28s %10.1f MB %10.1f MB" %
+          ("yearly totals", dictBytes / 1e6, arrayBytes / 1e6))
+    dictBytes, perFiling = allocated(filingDicts, filings)
+    arrayBytes, perFiling = allocated(filingArrays, filings)
+    print("%-28s %10.1f MB %10.1f MB" %
+          ("each filing's counts", dictBytes / 1e6, arrayBytes / 1e6))
+    dictTime, total = timed(args.repeats, dictTotals, [filings])
+    arrayTime, array = timed(args.repeats, arrayTotals, [filings])
+    print("%-28s %10.1f ms %10.1f ms" %
+          ("merge every filing", dictTime * 1000, arrayTime * 1000))
+    dictTime, dictTop = timed(args.repeats, topWords, total[0], 10)
+    arrayTime, arrayTop = timed(args.repeats, array[0].top, 10)
+    print("%-28s %10.1f ms %10.1f ms" %
+          ("top 10 of the total", dictTime * 1000, arrayTime * 1000))
+    # Each year's WordCounts also holds zeros for the words only other
+    # years use
+    same = all(dict((word, n) for word, n in a.top(len(a.counts)) if n) == d
+               for a, d in zip(arrays, totals)) and \
+           [n for word, n in dictTop] == [n for word, n in arrayTop]
+    if not same:
+        print("Error: The dictionaries and WordCounts disagree.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
+
+# End of script
@@ -0,0 +1,87 @@
+# Written by pjswords
+# Last updated December 8, 2017
+
+# This package retrieves and parses Apple's annual SEC filings from 2007
+# through 2015. After retrieving a report from Apple's website, the program
+# searches for the section titled "Item 1A. Risk Factors" and builds a
+# dictionary from the words in that section. The program then places
+# the contents of the dictionary into an object that corresponds to
+# a Microsoft Excel worksheet. While building the worksheets, the program also
+# provides console output showing which words have the highest frequency.
+# Once a worksheet is built for each report, the program saves them in a single
+# XLSX file that can be used with Tableau.
+#
+# Run it with "python -m secfilings" (or the Apple-SEC-filings.py script next
+# to this folder). The work is split into these modules:
+#
+#   fetch     which filings to process, and downloading them
+#   cache     the on-disk cache of downloaded reports and their word counts
+#   extract   turning a report's HTML into text and finding its sections
+#   tokenize  lemmatizing and filtering the words that get counted
+#   count     compact word counts and the year-over-year term matrix
+#   export    the console summary and the workbook, table and trend outputs
+#   ledger    the job ledger that lets an interrupted run resume
+#   index     the searchable index of Risk Factors text
+#   stats     stage timings, counters and the profiler hook
+#   service   the HTTP service behind the "serve" command
+#   cli       the command line
+#
+# Reports are downloaded concurrently by a small pool of worker threads, and
+# each report is parsed as soon as it arrives. The number of simultaneous
+# connections, the minimum delay between requests to the same host and the
+# number of retries can be set on the command line (run with --help). Any
+# URLs given on the command line replace the built-in list, which is handy for
+# pointing the program at a local copy of the filings.
+#
+# To process other companies or years, list the filings in a CSV manifest
+# with cik, filing_id and year columns (and optionally a url column) and
+# pass it with --manifest. Filings that can't be downloaded or analyzed are
+# skipped and listed at the end of the run along with the throughput.
+#
+# A job ledger (ledger.sqlite in the cache folder by default) records each
+# filing as it is fetched and counted, along with its word counts, so an
+# interrupted run picks up where it left off instead of starting over, and
+# filings that failed are tried again.
+#
+# With --index, the Risk Factors text of each report is also added to a
+# searchable index, and the "search" command then lists the reports
+# (optionally only from some --years) that contain a word or phrase, with
+# matches in context. The "cached" command lists the reports in the cache.
+#
+# At the end of a run the program prints how long was spent in each stage
+# (waiting for the rate limiter, downloading, parsing HTML, scanning for Risk
+# Factors, lemmatizing, filling the outputs and so on). --report saves those
+# times, together with counts like lines scanned, tokens and cache hits, for
+# the whole run and for each filing to a JSON file. --profile runs one stage
+# (or the whole run) under cProfile, or pyinstrument with --profiler.
+#
+# Other sections of the 10-K can be counted along with (or instead of) Risk
+# Factors by listing their Item numbers with --sections, such as
+# "--sections 1A,7" for Risk Factors and Management's Discussion and
+# Analysis, or "--sections all". Every section is found in the same single
+# pass over the report, and each gets its own worksheets, rows in the
+# --table output and --trends files.
+#
+# "serve" keeps the program running as a local HTTP service that answers
+# queries as JSON: POST /analyze counts the words of a filing's sections,
+# GET /counts returns the word counts of one section of a filing and GET
+# /compare the words rising and falling the most between two years. The
+# lemmatizer is loaded once and the word counts of the most recently used
+# filings (--memory-size of them) are kept in memory, so repeated queries
+# are answered in milliseconds. Queries are answered on many threads at
+# once, and the service shares the job ledger and the cache with "run".
+#
+# Downloaded reports are kept in an on-disk cache (the "filingcache" folder by
+# default). Annual reports don't
+# change once they're filed, so later runs read them straight from the cache
+# without touching the network. Use --revalidate to ask the server whether a
+# cached report has changed, or --offline to never use the network at all.
+# The sections and their word counts are cached too, so a report
+# that has been analyzed before is only reprocessed when the analysis
+# settings (stopwords, lemmatizer or pipelineVersion in tokenize.py) change
+# or sections it wasn't searched for before are asked for.
+#
+# Note: This package was written for Python 3, and it requires access to the
+# OpenPyXL and nltk libraries. The year-over-year trends saved with --trends
+# also need NumPy and SciPy. None of these are imported until they're needed,
+# so commands that don't use them start quickly.
@@ -0,0 +1,5 @@
+# Lets the package be run with "python -m secfilings"
+
+from .cli import main
+
+main()
@@ -0,0 +1,139 @@
+# cache.py: The on-disk cache of downloaded reports and of the text and
+# word counts of the sections found in them
+
+import glob, hashlib, json, os, threading, time
+
+# FilingCache: A folder of downloaded reports. Each report's HTML and the
+# text extracted from it are stored under the SHA-256 hash of the HTML,
+# and an index file maps filing IDs to those hashes along with the URL the
+# report came from and the ETag and Last-Modified values needed to ask the
+# server whether a report changed.
+#
+# Rewriting the whole index each time a report is used would cost more than
+# the cache saves on a long run, so the index is only written out by
+# evict() (at the end of every run) and, while reports are being
+# downloaded, at most once every saveInterval seconds.
+class FilingCache:
+    saveInterval = 5.0
+
+    def __init__(self, directory, maxBytes):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.lock = threading.Lock()
+        self.lastSave = time.monotonic()
+        self.indexPath = os.path.join(directory, "index.json")
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.indexPath, "r", -1, "utf-8") as file:
+                self.index = json.load(file)
+        except (IOError, ValueError):
+            self.index = dict()
+
+    # blobPath(): Returns the file name used for a hash and file type
+    def blobPath(self, digest, suffix):
+        return os.path.join(self.directory, digest + suffix)
+
+    # writeBlob(): Writes a file without leaving a partial copy behind
+    # if the program is interrupted
+    def writeBlob(self, path, data):
+        temp = path + "." + str(os.getpid()) + "." + \
+               str(threading.get_ident()) + ".tmp"
+        with open(temp, "wb") as file:
+            file.write(data)
+        os.replace(temp, path)
+
+    # save(): Writes the index to disk. Must be called with the lock held.
+    def save(self):
+        self.writeBlob(self.indexPath,
+                       bytes(json.dumps(self.index, indent=1), "utf-8"))
+        self.lastSave = time.monotonic()
+
+    # lookup(): Returns the cache entry for a filing ID, or None if the
+    # report hasn't been downloaded from url or its HTML has gone missing.
+    # A report cached for the same filing ID from another URL doesn't count,
+    # since nothing says the two are the same document.
+    def lookup(self, filingID, url):
+        with self.lock:
+            entry = self.index.get(filingID)
+        if entry is None or entry.get("url") != url or \
+                not os.path.exists(self.blobPath(entry["digest"], ".html")):
+            return None
+        return entry
+
+    # touch(): Marks a report as recently used so it isn't evicted soon.
+    # The index on disk catches up the next time it's saved.
+    def touch(self, filingID):
+        with self.lock:
+            self.index[filingID]["lastUsed"] = time.time()
+
+    # store(): Adds a freshly downloaded report and returns its hash
+    def store(self, filingID, url, html, etag, lastModified):
+        digest = hashlib.sha256(html).hexdigest()
+        path = self.blobPath(digest, ".html")
+        if not os.path.exists(path):
+            self.writeBlob(path, html)
+        with self.lock:
+            self.index[filingID] = {"digest": digest, "url": url,
+                                    "etag": etag,
+                                    "lastModified": lastModified,
+                                    "lastUsed": time.time()}
+            if time.monotonic() - self.lastSave >= self.saveInterval:
+                self.save()
+        return digest
+
+    # pagePath(): Returns the file name of a cached report's HTML
+    def pagePath(self, digest):
+        return self.blobPath(digest, ".html")
+
+    # readAnalysis(): Returns a dictionary with the text and word counts of
+    # each section (by Item number) found in a cached report with the given
+    # analysis settings. It's empty if the report hasn't been analyzed that
+    # way yet.
+    def readAnalysis(self, digest, settings):
+        try:
+            with open(self.blobPath(digest, "." + settings + ".json"), "r",
+                      -1, "utf-8") as file:
+                analysis = json.load(file)
+        except (IOError, ValueError):
+            return dict()
+        return dict((key, (section["text"], section["counts"]))
+                    for key, section in analysis["sections"].items())
+
+    # storeAnalysis(): Saves the text and word counts of each section of a
+    # report, given as a dictionary like the one readAnalysis() returns
+    def storeAnalysis(self, digest, settings, sections):
+        analysis = {"sections": dict((key, {"text": text, "counts": d})
+                                     for key, (text, d) in sections.items())}
+        self.writeBlob(self.blobPath(digest, "." + settings + ".json"),
+                       bytes(json.dumps(analysis), "utf-8"))
+
+    # evict(): Removes the least recently used reports until the cache is
+    # no larger than maxBytes
+    def evict(self):
+        with self.lock:
+            sizes = dict()
+            for entry in self.index.values():
+                digest = entry["digest"]
+                sizes[digest] = 0
+                for path in glob.glob(self.blobPath(digest, ".*")):
+                    try:
+                        sizes[digest] += os.path.getsize(path)
+                    except OSError:
+                        pass
+            total = sum(sizes.values())
+            for filingID, entry in sorted(self.index.items(),
+                                          key = lambda x: x[1]["lastUsed"]):
+                if total <= self.maxBytes:
+                    break
+                del self.index[filingID]
+                digest = entry["digest"]
+                # Several filing IDs may point at the same content
+                if any(e["digest"] == digest for e in self.index.values()):
+                    continue
+                for path in glob.glob(self.blobPath(digest, ".*")):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total = total - sizes[digest]
+            self.save()
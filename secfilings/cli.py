@@ -0,0 +1,653 @@
+# cli.py: The command line. "run" (the default) downloads and analyzes
+# filings, "serve" answers queries about them over HTTP, "search" looks for
+# a word or phrase in the search index and "cached" lists the reports in
+# the filing cache.
+
+import argparse, os, re, sqlite3, sys, time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, \
+                               ThreadPoolExecutor, wait
+
+from .cache import FilingCache
+from .count import Vocabulary, WordCounts, topWords
+from .export import TableSink, TrendSink, WorkbookSink, printTopWords
+from .extract import analyzeFiling, analyzeInWorker, initWorker, parseItems
+from .fetch import HostRateLimiter, builtInFilings, filingURLTemplate, \
+                   readManifest, retrieveFiling, webPageList
+from .index import SearchIndex, searchReports
+from .ledger import Ledger, resumeStep
+from .service import AnalysisService, ServiceServer
+from .stats import StageProfiler, StageTimer, peakMemory, writeRunReport
+from .tokenize import analysisSettings, lemma
+
+# waitForUser(): Holds the console window open until user is ready to quit,
+# then exits with the given status. When the program isn't attached to a
+# console (in a batch job, for instance) there's nobody to wait for, so it
+# exits straight away.
+def waitForUser(status=0):
+    if sys.stdin.isatty() and sys.stdout.isatty():
+        try:
+            input("\nPress the Enter key to exit.")
+        except (KeyboardInterrupt, EOFError):
+            pass
+    sys.exit(status)
+
+# addFilingArguments(): Adds the settings shared by the commands that
+# download and analyze filings: which filings and sections, how to download
+# them and where to keep what's been found
+def addFilingArguments(parser):
+    parser.add_argument("--manifest", metavar="FILE",
+                        help="CSV file listing the filings to process, with " +
+                             "cik, filing_id and year columns and an " +
+                             "optional url column")
+    parser.add_argument("--url-template", default=filingURLTemplate,
+                        help="address of a filing listed in the manifest " +
+                             "without a url; {cik} and {filing_id} are " +
+                             "filled in (default: Apple's investor site)")
+    parser.add_argument("--ledger", metavar="FILE",
+                        help="SQLite job ledger recording the progress and " +
+                             "word counts of each filing (default: " +
+                             "ledger.sqlite in the cache folder)")
+    parser.add_argument("--sections", default="1A", metavar="ITEMS",
+                        help="comma-separated Item numbers of the sections " +
+                             "to count, such as 1A,7 for Risk Factors and " +
+                             "MD&A, or \"all\" (default: 1A)")
+    parser.add_argument("--host-delay", type=float, default=0.5,
+                        help="minimum seconds between requests to the same " +
+                             "host (default: 0.5)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="number of times to retry a failed download " +
+                             "(default: 3)")
+    parser.add_argument("--backoff", type=float, default=1.0,
+                        help="seconds to wait before the first retry; the " +
+                             "wait doubles after each attempt (default: 1.0)")
+    parser.add_argument("--timeout", type=float, default=30.0,
+                        help="seconds to wait for a server to respond " +
+                             "(default: 30)")
+    parser.add_argument("--cache-dir", default="filingcache",
+                        help="folder for cached reports (default: filingcache)")
+    parser.add_argument("--cache-size", type=float, default=500,
+                        help="maximum size of the cache in megabytes; the " +
+                             "least recently used reports are removed first " +
+                             "(default: 500)")
+    parser.add_argument("--revalidate", action="store_true",
+                        help="check with the server whether cached reports " +
+                             "have changed before using them")
+    parser.add_argument("--offline", action="store_true",
+                        help="only use cached reports and never connect to " +
+                             "the network")
+    parser.add_argument("--lemma-cache", metavar="FILE",
+                        help="remember lemmas between runs in this file")
+    parser.add_argument("--lemma-cache-size", type=int, default=100000,
+                        help="maximum number of distinct words whose lemmas " +
+                             "are remembered (default: 100000)")
+
+# checkFilingArguments(): Checks the settings added by addFilingArguments()
+# and turns --sections into a list of Item numbers
+def checkFilingArguments(parser, args):
+    if args.offline and args.revalidate:
+        parser.error("--offline and --revalidate cannot be used together")
+    if args.lemma_cache_size < 1:
+        parser.error("--lemma-cache-size must be at least 1")
+    try:
+        args.sections = parseItems(args.sections)
+    except ValueError as e:
+        parser.error("--sections: " + str(e))
+
+# parseArguments(): Reads the command and its settings. Without a command,
+# the arguments are taken to be those of "run", so the program can still be
+# started the way it always has been.
+def parseArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="secfilings",
+        description="Build a word-frequency workbook from the Risk Factors " +
+                    "section (or any other sections) of Apple's annual SEC " +
+                    "filings.")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    run = commands.add_parser(
+        "run", help="download and analyze filings (the default)",
+        description="Download filings and count the words in their Risk " +
+                    "Factors sections, or in whichever sections --sections " +
+                    "asks for.")
+    run.add_argument("urls", nargs="*", metavar="URL",
+                     help="filing pages to process instead of the " +
+                          "built-in list (the first is treated as 2007)")
+    addFilingArguments(run)
+    run.add_argument("--connections", type=int, default=4,
+                     help="maximum number of simultaneous downloads " +
+                          "(default: 4)")
+    run.add_argument("--keep-text", action="store_true",
+                     help="write the text scanned in each analyzed " +
+                          "report to httpfile<N>.txt for debugging")
+    run.add_argument("--jobs", type=int, default=1,
+                     help="number of worker processes used to analyze " +
+                          "reports (default: 1, analyze in this process)")
+    run.add_argument("--xlsx", default="apple.xlsx", metavar="FILE",
+                     help="workbook to save the word counts to " +
+                          "(default: apple.xlsx)")
+    run.add_argument("--no-xlsx", dest="xlsx", action="store_const",
+                     const=None, help="don't save a workbook")
+    run.add_argument("--write-only", action="store_true",
+                     help="stream rows into a write-only workbook, which " +
+                          "keeps memory use low for large vocabularies")
+    run.add_argument("--table", metavar="NAME",
+                     help="also save every word count to one long-format " +
+                          "table, NAME.parquet if pyarrow is installed " +
+                          "or NAME.csv.gz otherwise")
+    run.add_argument("--trends", metavar="NAME",
+                     help="also save a word-by-report count matrix to " +
+                          "NAME.npz and each year's most common words, " +
+                          "the words rising and falling the most each " +
+                          "year and each report's top TF-IDF words to " +
+                          "NAME-trends.csv (needs NumPy and SciPy)")
+    run.add_argument("--index", metavar="FILE",
+                     help="keep a searchable index of the Risk Factors " +
+                          "text of each report in this SQLite file")
+    run.add_argument("--report", metavar="FILE",
+                     help="save the time spent in each stage of the run " +
+                          "and counts such as lines scanned and cache " +
+                          "hits, for the whole run and each filing, to " +
+                          "this JSON file")
+    run.add_argument("--profile", choices=("analyze", "export", "run"),
+                     help="profile every call made while analyzing " +
+                          "reports, filling the outputs or during the " +
+                          "whole run")
+    run.add_argument("--profiler", choices=("cprofile", "pyinstrument"),
+                     default="cprofile",
+                     help="profiler used by --profile (default: cprofile)")
+    run.add_argument("--profile-output", metavar="FILE",
+                     help="file to save the profile to (default: " +
+                          "profile-STAGE.pstats, or profile-STAGE.html " +
+                          "with pyinstrument)")
+
+    search = commands.add_parser(
+        "search", help="find a word or phrase in the search index",
+        description="List the reports in a search index built with " +
+                    "\"run --index\" that contain a word or phrase.")
+    search.add_argument("phrase", help="word or phrase to look for")
+    search.add_argument("--index", metavar="FILE", required=True,
+                        help="search index to look in")
+    search.add_argument("--years", metavar="FIRST[-LAST]",
+                        help="only search reports from these years")
+
+    cached = commands.add_parser(
+        "cached", help="list the reports in the filing cache",
+        description="List the reports in the filing cache, most recently " +
+                    "used first.")
+    cached.add_argument("--cache-dir", default="filingcache",
+                        help="folder for cached reports (default: filingcache)")
+
+    serve = commands.add_parser(
+        "serve", help="answer queries about filings over HTTP",
+        description="Keep the lemmatizer and the word counts of recently " +
+                    "used filings in memory and answer queries about them " +
+                    "over HTTP until interrupted with Ctrl+C. Filings are " +
+                    "downloaded and analyzed the first time they're asked " +
+                    "about.")
+    serve.add_argument("--host", default="127.0.0.1",
+                       help="address to listen on (default: 127.0.0.1)")
+    serve.add_argument("--port", type=int, default=8750,
+                       help="port to listen on (default: 8750)")
+    serve.add_argument("--memory-size", type=int, default=1000,
+                       metavar="FILINGS",
+                       help="number of filings whose word counts are kept " +
+                            "in memory; the least recently used are " +
+                            "dropped first (default: 1000)")
+    addFilingArguments(serve)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if not argv or (argv[0] not in commands.choices and
+                    argv[0] not in ("-h", "--help")):
+        argv = ["run"] + list(argv)
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if args.manifest and args.urls:
+            run.error("URLs cannot be given along with --manifest")
+        checkFilingArguments(run, args)
+        if args.connections < 1:
+            run.error("--connections must be at least 1")
+        if args.jobs < 1:
+            run.error("--jobs must be at least 1")
+        if args.profile == "analyze" and args.jobs > 1:
+            run.error("--profile analyze only works with --jobs 1")
+        if args.profile_output and not args.profile:
+            run.error("--profile-output needs --profile")
+        if args.index and "1A" not in args.sections:
+            run.error("--index needs the Risk Factors section (1A) in " +
+                      "--sections")
+    if args.command == "serve":
+        checkFilingArguments(serve, args)
+        if args.memory_size < 1:
+            serve.error("--memory-size must be at least 1")
+    if args.command == "search" and args.years:
+        match = re.fullmatch(r"([0-9]{4})(?:-([0-9]{4}))?", args.years.strip())
+        if not match:
+            search.error("--years must be a year or a range such as 2010-2015")
+        args.years = (int(match.group(1)), int(match.group(2) or
+                                               match.group(1)))
+    return args
+
+# searchCommand(): Lists the reports in the search index that contain a word
+# or phrase
+def searchCommand(args):
+    if not os.path.exists(args.index):
+        print("Error: There is no search index at " + args.index + ". " +
+              "Aborting program.")
+        sys.exit(1)
+    searchReports(args.index, args.phrase, args.years)
+
+# cachedCommand(): Lists the reports in the filing cache, most recently
+# used first, and whether they've been analyzed with the current settings
+def cachedCommand(args):
+    if not os.path.exists(os.path.join(args.cache_dir, "index.json")):
+        print("There are no cached reports in " + args.cache_dir + ".")
+        return
+    cache = FilingCache(args.cache_dir, 0)
+    settings = analysisSettings()
+    totalBytes = 0
+    for filingID, entry in sorted(cache.index.items(),
+                                  key = lambda x: x[1]["lastUsed"],
+                                  reverse = True):
+        digest = entry["digest"]
+        try:
+            size = os.path.getsize(cache.pagePath(digest))
+        except OSError:
+            print("%-24s (HTML missing)" % filingID)
+            continue
+        totalBytes = totalBytes + size
+        analyzed = os.path.exists(cache.blobPath(digest, "." + settings +
+                                                 ".json"))
+        print("%-24s %9.1f KB  used %s  %s" %
+              (filingID, size / 1024,
+               time.strftime("%Y-%m-%d %H:%M",
+                             time.localtime(entry["lastUsed"])),
+               "analyzed" if analyzed else "not analyzed"))
+    print(str(len(cache.index)) + " cached report(s), %.1f MB of HTML." %
+          (totalBytes / 1024 / 1024))
+
+# printStageTimes(): Prints where the time went, largest stage first. With
+# several downloads or workers running at once, the stages add up to more
+# than the time the run took.
+def printStageTimes(seconds):
+    stages = sorted(seconds.items(), key = lambda x: x[1], reverse = True)
+    print("Time by stage: " + ", ".join(stage + " %.2fs" % elapsed
+                                        for stage, elapsed in stages) + ".")
+
+# runCommand(): Downloads and analyzes the filings and saves their word
+# counts. If a profiler is given, it profiles its chosen stage of the run.
+def runCommand(args, profiler=None):
+    if args.manifest:
+        try:
+            filings = readManifest(args.manifest, args.url_template)
+        except (IOError, ValueError) as e:
+            print("Error: Could not read the manifest " + args.manifest +
+                  " (" + str(e) + "). Aborting program.")
+            waitForUser(1)
+    else:
+        filings = builtInFilings(tuple(args.urls) or webPageList)
+    total = len(filings)
+    items = args.sections
+    started = time.monotonic()
+    startedAt = time.time()
+    if profiler is not None:
+        profile = profiler.call
+    else:
+        profile = lambda stage, function, *args: function(*args)
+
+    # Where the word counts of each report end up
+    sinks = []
+    if args.xlsx:
+        sinks.append(WorkbookSink(args.xlsx, filings, items, args.write_only))
+    if args.table:
+        sinks.append(TableSink(args.table, filings, items))
+    if args.trends:
+        try:
+            sinks.append(TrendSink(args.trends, filings, items))
+        except ImportError as e:
+            print("Error: --trends needs NumPy and SciPy (" + str(e) + "). " +
+                  "Aborting program.")
+            waitForUser(1)
+    cache = FilingCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+    settings = analysisSettings()
+    try:
+        ledger = Ledger(args.ledger or os.path.join(args.cache_dir,
+                                                    "ledger.sqlite"))
+    except sqlite3.Error as e:
+        print("Error: Could not open the job ledger (" + str(e) + "). " +
+              "Aborting program.")
+        waitForUser(1)
+    index = None
+    if args.index:
+        try:
+            index = SearchIndex(args.index)
+        except sqlite3.Error as e:
+            print("Error: Could not open the search index (" + str(e) +
+                  "). Aborting program.")
+            waitForUser(1)
+    lemma.maxSize = args.lemma_cache_size
+    if args.lemma_cache:
+        lemma.load(args.lemma_cache)
+    limiter = HostRateLimiter(args.host_delay)
+    pool = ThreadPoolExecutor(max_workers=args.connections)
+    # With more than one job, reports are analyzed by a pool of worker
+    # processes. Only this process touches the ledger and the output sinks.
+    workers = None
+    if args.jobs > 1:
+        # WordNet is loaded the first time a word is lemmatized. Doing that
+        # now lets worker processes started by fork() share the loaded copy
+        # instead of each loading their own.
+        lemma.start().lemmatize("risks")
+        workers = ProcessPoolExecutor(max_workers=args.jobs,
+                                      initializer=initWorker,
+                                      initargs=(args.cache_dir,
+                                                args.lemma_cache_size,
+                                                args.lemma_cache))
+    downloads = dict()
+    analyses = dict()
+    pending = set()
+    exported = []
+    failures = []
+    resumed = 0
+    done = 0
+    # Each section gets its own vocabulary, so its totals only hold the
+    # words that actually appear in it
+    totals = dict((key, WordCounts(Vocabulary())) for key in items)
+    # Each report's StageTimer, and how it turned out, for the run report
+    timers = {count: StageTimer() for count in range(1, total + 1)}
+    outcomes = dict()
+    runTimer = StageTimer()
+
+    # Give a report's word counts to each output sink
+    def export(count, counts):
+        for sink in sinks:
+            sink.add(count, counts)
+
+    # Hand the word counts of a report's sections to the output sinks, or
+    # tell them it couldn't be processed, and record either outcome in the
+    # ledger
+    def finish(count, digest, counts, error=None, fromLedger=False):
+        nonlocal done
+        filing = filings[count - 1]
+        timer = timers[count]
+        done = done + 1
+        if counts is None:
+            failures.append((filing, error))
+            outcomes[count] = ("failed", str(error))
+            print("Error: Could not process filing " + filing.filingID +
+                  " (" + str(error) + "). Skipping it.")
+            timer.switch("export")
+            for sink in sinks:
+                sink.skip(count)
+            timer.switch("record")
+            ledger.update(filing, "failed", error=str(error))
+            timer.switch(None)
+            return
+        outcomes[count] = ("resumed" if fromLedger else "counted", None)
+        timer.switch("record")
+        if not fromLedger:
+            ledger.update(filing, "counted", digest, settings, counts)
+        timer.switch("export")
+        for key in items:
+            if len(items) > 1:
+                printTopWords(topWords(counts[key], 10),
+                              "Item " + key + " of this report")
+            else:
+                printTopWords(topWords(counts[key], 10))
+            totals[key].add(counts[key])
+        profile("export", export, count, counts)
+        timer.switch("record")
+        if index is not None and not index.current(filing, digest + "." +
+                                                   settings):
+            analysis = cache.readAnalysis(digest, settings)
+            if "1A" in analysis:
+                index.add(filing, digest + "." + settings, analysis["1A"][0])
+            else:
+                print("Warning: The Risk Factors text of filing " +
+                      filing.filingID + " is no longer cached, so it " +
+                      "wasn't indexed.")
+        timer.switch(None)
+        exported.append(filing)
+        # Let the user know when the report is done
+        print("Page " + str(count) + " processed (" + str(done) +
+              " of " + str(total) + " complete).\n")
+
+    # Work out a report's word counts, either here or in a worker process
+    def analyze(count, digest):
+        if workers is not None:
+            analysis = workers.submit(analyzeInWorker, digest, settings,
+                                      items, count, total, args.keep_text)
+            analyses[analysis] = (count, digest)
+            pending.add(analysis)
+            return
+        try:
+            counts = profile("analyze", analyzeFiling, digest, cache,
+                             settings, items, count, total, args.keep_text,
+                             timers[count])
+        # One malformed report shouldn't stop a long batch run
+        except Exception as e:
+            finish(count, digest, None, e)
+            return
+        finish(count, digest, counts)
+
+    # Pick up each report where the ledger says an earlier run left it.
+    # Reports whose sections were already counted with the current settings
+    # need no more work, and reports already fetched go straight to
+    # analysis. Everything else starts with a download.
+    for count, filing in enumerate(filings, 1):
+        entry = ledger.lookup(filing)
+        step = resumeStep(entry, settings, items, cache, args.revalidate)
+        if step == "reuse":
+            state, digest, counted, counts = entry
+            resumed = resumed + 1
+            finish(count, digest, dict((key, counts[key]) for key in items),
+                   fromLedger=True)
+            continue
+        elif step == "analyze":
+            analyze(count, entry[1])
+            continue
+        future = pool.submit(retrieveFiling, filing, cache, limiter, args,
+                             timers[count])
+        downloads[future] = count
+        pending.add(future)
+
+    # Analyze each report as soon as its download finishes, and hand its
+    # word counts to the output sinks as soon as they're ready. A report
+    # that can't be downloaded or analyzed is skipped.
+    while pending:
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            if future in downloads:
+                count = downloads[future]
+                try:
+                    digest = future.result()
+                # Besides network errors, a malformed URL in the manifest
+                # raises ValueError; either way only this filing is lost
+                except Exception as e:
+                    finish(count, None, None, e)
+                    continue
+                ledger.update(filings[count - 1], "fetched", digest)
+                analyze(count, digest)
+            else:
+                count, digest = analyses[future]
+                try:
+                    counts, timer, learned = future.result()
+                except Exception as e:
+                    finish(count, digest, None, e)
+                    continue
+                timers[count].merge(timer)
+                # Lemmas looked up by the workers are saved along with
+                # this process's
+                if learned:
+                    lemma.learn(learned)
+                lemma.hits = lemma.hits + timer.counts.get("lemma_hits", 0)
+                lemma.misses = lemma.misses + \
+                               timer.counts.get("lemma_misses", 0)
+                finish(count, digest, counts)
+    pool.shutdown()
+    if workers is not None:
+        workers.shutdown()
+    runTimer.switch("evict")
+    cache.evict()
+    if args.lemma_cache:
+        try:
+            lemma.save(args.lemma_cache)
+        except IOError:
+            print("Warning: Could not save the lemma cache to " +
+                  args.lemma_cache + ".")
+
+    # When we've finished iterating through each web page, finish off
+    # every output and report how the run went.
+    runTimer.switch("export")
+    for sink in sinks:
+        try:
+            profile("export", sink.close)
+        except PermissionError as e:
+            print("Error: Could not save " + str(e.filename) + ". Check to " +
+                  "see if the target file already exists and is open or " +
+                  "flagged as read-only. Aborting program.")
+            waitForUser(1)
+    runTimer.switch("record")
+    ledger.exported(exported)
+    ledger.close()
+    if index is not None:
+        index.close()
+    runTimer.switch(None)
+    elapsed = time.monotonic() - started
+    processed = total - len(failures)
+    if processed > 1:
+        for key in items:
+            if len(items) > 1:
+                printTopWords(totals[key].top(10),
+                              "Item " + key + " of all reports")
+            else:
+                printTopWords(totals[key].top(10), "all reports")
+    print("Processed " + str(processed) + " of " + str(total) + " filings in " +
+          "%.1f seconds" % elapsed + " (" + str(resumed) +
+          " finished by an earlier run, " + str(len(failures)) + " failed).")
+    if processed > resumed:
+        print("Throughput: %.2f filings per second, %.3f seconds per filing." %
+              ((processed - resumed) / elapsed, elapsed / (processed - resumed)))
+    for filing, error in failures:
+        print("\tFailed: CIK " + filing.cik + ", filing " + filing.filingID +
+              ", " + str(filing.year) + " (" + str(error) + ")")
+    print("Lemmatizer cache: " + str(lemma.hits) + " hits, " +
+          str(lemma.misses) + " misses.")
+    stageTotals = StageTimer()
+    for timer in timers.values():
+        stageTotals.merge(timer)
+    stageTotals.merge(runTimer)
+    printStageTimes(stageTotals.seconds)
+
+    if args.report:
+        mainMemory, workerMemory = peakMemory()
+        report = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S",
+                                     time.localtime(startedAt)),
+            "seconds": elapsed,
+            "settings": settings,
+            "sections": items,
+            "jobs": args.jobs,
+            "connections": args.connections,
+            "filings": total,
+            "processed": processed,
+            "resumed": resumed,
+            "failed": len(failures),
+            "stages": stageTotals.seconds,
+            "counts": stageTotals.counts,
+            "lemmatizer": {"hits": lemma.hits, "misses": lemma.misses},
+            "peak_memory_mb": {"main": mainMemory, "workers": workerMemory},
+            "reports": [{"cik": filing.cik,
+                         "filing_id": filing.filingID,
+                         "year": filing.year,
+                         "status": outcomes[count][0],
+                         "error": outcomes[count][1],
+                         "seconds": sum(timers[count].seconds.values()),
+                         "stages": timers[count].seconds,
+                         "counts": timers[count].counts}
+                        for count, filing in enumerate(filings, 1)]}
+        try:
+            writeRunReport(args.report, report)
+            print("Run report saved to " + args.report + ".")
+        except IOError as e:
+            print("Warning: Could not save the run report to " + args.report +
+                  " (" + str(e) + ").")
+    print("Processing complete.")
+
+# serveCommand(): Answers queries about the filings over HTTP until
+# interrupted. The lemmatizer is started before the first query comes in,
+# and the job ledger and filing cache are shared with "run", so anything
+# either one has already done is reused.
+def serveCommand(args):
+    if args.manifest:
+        try:
+            filings = readManifest(args.manifest, args.url_template)
+        except (IOError, ValueError) as e:
+            print("Error: Could not read the manifest " + args.manifest +
+                  " (" + str(e) + "). Aborting program.")
+            sys.exit(1)
+    else:
+        filings = builtInFilings(webPageList)
+    cache = FilingCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+    try:
+        # Queries are answered on many threads, which take turns using the
+        # ledger
+        ledger = Ledger(args.ledger or os.path.join(args.cache_dir,
+                                                    "ledger.sqlite"), True)
+    except sqlite3.Error as e:
+        print("Error: Could not open the job ledger (" + str(e) + "). " +
+              "Aborting program.")
+        sys.exit(1)
+    lemma.maxSize = args.lemma_cache_size
+    if args.lemma_cache:
+        lemma.load(args.lemma_cache)
+    lemma.start().lemmatize("risks")
+    service = AnalysisService(filings, cache, ledger, analysisSettings(),
+                              args.sections, HostRateLimiter(args.host_delay),
+                              args)
+    try:
+        server = ServiceServer((args.host, args.port), service)
+    except OSError as e:
+        print("Error: Could not listen on " + args.host + " port " +
+              str(args.port) + " (" + str(e) + "). Aborting program.")
+        service.close()
+        sys.exit(1)
+    print("Answering queries about " + str(len(filings)) + " filings at " +
+          "http://" + args.host + ":" + str(server.server_address[1]) +
+          "/ (press Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    service.close()
+    cache.evict()
+    print("Service stopped.")
+
+def main(argv=None):
+    args = parseArguments(argv)
+    if args.command == "search":
+        searchCommand(args)
+    elif args.command == "serve":
+        serveCommand(args)
+    elif args.command == "cached":
+        cachedCommand(args)
+    else:
+        profiler = None
+        if args.profile:
+            extension = ".html" if args.profiler == "pyinstrument" else \
+                        ".pstats"
+            try:
+                profiler = StageProfiler(args.profile, args.profiler,
+                                         args.profile_output or "profile-" +
+                                         args.profile + extension)
+            except ImportError as e:
+                print("Error: --profiler pyinstrument needs pyinstrument (" +
+                      str(e) + "). Aborting program.")
+                waitForUser(1)
+        if profiler is not None:
+            profiler.call("run", runCommand, args, profiler)
+            profiler.save()
+        else:
+            runCommand(args)
+        waitForUser()
@@ -0,0 +1,215 @@
+# count.py: Ways of holding and querying word counts beyond the plain
+# dictionary each report's counts come in
+
+import heapq
+from array import array
+
+# topWords(): The k most frequent words in a dictionary of word counts as
+# (word, count) pairs, most frequent first. A heap finds them without
+# sorting the whole dictionary, and ties come out in dictionary order just
+# as they would with sorted().
+def topWords(d, k):
+    return heapq.nlargest(k, d.items(), key = lambda x: x[1])
+
+# compareCounts(): The k words whose share of the words counted grew the
+# most between two dictionaries of word counts, and the k whose share
+# shrank the most, as two lists of (word, change) pairs, biggest change
+# first. These are the same as TermMatrix.risers() and fallers(), right
+# down to which of two tied words comes first, but don't need NumPy.
+def compareCounts(old, new, k):
+    oldScale = 1 / (sum(old.values()) or 1)
+    newScale = 1 / (sum(new.values()) or 1)
+    change = dict((word, n * newScale) for word, n in new.items())
+    for word, n in old.items():
+        change[word] = change.get(word, 0.0) - n * oldScale
+    risers = heapq.nsmallest(k, ((-x, word) for word, x in change.items()
+                                 if x > 0))
+    fallers = heapq.nsmallest(k, ((x, word) for word, x in change.items()
+                                  if x < 0))
+    return [(word, -x) for x, word in risers], \
+           [(word, x) for x, word in fallers]
+
+# Vocabulary: Gives each distinct word a number, counting up from 0 in the
+# order the words are first seen
+class Vocabulary:
+    def __init__(self):
+        self.numbers = dict()
+        self.words = []
+
+    def __len__(self):
+        return len(self.words)
+
+    # numberAll(): Returns the numbers of a list of words, numbering any
+    # words that haven't been seen before
+    def numberAll(self, words):
+        numbers = self.numbers
+        result = []
+        for word in words:
+            number = numbers.get(word)
+            if number is None:
+                number = numbers[word] = len(self.words)
+                self.words.append(word)
+            result.append(number)
+        return result
+
+# WordCounts: Word counts kept in an array indexed by vocabulary number,
+# which takes 8 bytes per word instead of a dictionary entry, a key and an
+# int object. Counts from any number of reports, analyzed here or in
+# worker processes, can be merged into one WordCounts with add().
+class WordCounts:
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self.counts = array("q")
+
+    # add(): Adds a dictionary of word counts
+    def add(self, d):
+        numbers = self.vocabulary.numberAll(d)
+        counts = self.counts
+        if len(counts) < len(self.vocabulary):
+            counts.frombytes(bytes(counts.itemsize *
+                                   (len(self.vocabulary) - len(counts))))
+        for number, n in zip(numbers, d.values()):
+            counts[number] = counts[number] + n
+
+    # top(): The k most frequent words as (word, count) pairs, most frequent
+    # first, with ties in vocabulary order
+    def top(self, k):
+        counts = self.counts
+        words = self.vocabulary.words
+        return [(words[i], counts[i]) for i in
+                heapq.nlargest(k, range(len(counts)), key = counts.__getitem__)]
+
+# TermMatrix: The word counts of every report in one sparse matrix, with a
+# row for each word and a column for each report. Words are numbered in a
+# Vocabulary shared by all the reports, and reports from the same year are
+# added together for the year-over-year queries. Needs NumPy and SciPy,
+# which are only imported when a TermMatrix is created.
+class TermMatrix:
+    def __init__(self):
+        import numpy, scipy.sparse
+        self.numpy = numpy
+        self.sparse = scipy.sparse
+        self.vocabulary = Vocabulary()
+        self.filings = []
+        self.rows = []
+        self.counts = []
+        self.built = False
+
+    # add(): Adds a report's word counts as a new column
+    def add(self, filing, d):
+        rows = self.vocabulary.numberAll(d)
+        self.rows.append(self.numpy.array(rows, self.numpy.int32))
+        self.counts.append(self.numpy.fromiter(d.values(), self.numpy.int64,
+                                               len(d)))
+        self.filings.append(filing)
+        self.built = False
+
+    # build(): Assembles the matrices the queries below work on. Words are
+    # put in alphabetical order and reports in order of year, CIK and filing
+    # ID, so the result doesn't depend on the order the reports were added.
+    # byFiling holds the counts of each report and byYear the counts of
+    # each year.
+    def build(self):
+        if self.built:
+            return
+        np = self.numpy
+        words = np.array(self.vocabulary.words, dtype=str)
+        order = np.argsort(words, kind="stable")
+        rank = np.empty(len(order), np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        self.words = words[order]
+        columns = np.lexsort(([f.filingID for f in self.filings],
+                              [f.cik for f in self.filings],
+                              [f.year for f in self.filings]))
+        self.columnFilings = [self.filings[i] for i in columns]
+        position = np.empty(len(columns), np.int64)
+        position[columns] = np.arange(len(columns))
+        lengths = [len(rows) for rows in self.rows]
+        rows = rank[np.concatenate(self.rows)] if self.rows else \
+               np.zeros(0, np.int32)
+        counts = np.concatenate(self.counts) if self.counts else \
+                 np.zeros(0, np.int64)
+        self.byFiling = self.sparse.csc_matrix(
+            (counts, (rows, np.repeat(position, lengths))),
+            shape=(len(self.words), len(columns)))
+        years = np.array([f.year for f in self.columnFilings], np.int64)
+        self.years, yearColumns = np.unique(years, return_inverse=True)
+        toYear = self.sparse.csr_matrix(
+            (np.ones(len(columns), np.int64),
+             (np.arange(len(columns)), yearColumns)),
+            shape=(len(columns), len(self.years)))
+        self.byYear = (self.byFiling @ toYear).tocsc()
+        self.built = True
+
+    # scaleColumns(): Divides each column of a matrix by its total, leaving
+    # empty columns alone
+    def scaleColumns(self, m):
+        totals = self.numpy.asarray(m.sum(axis=0), dtype=float).ravel()
+        totals[totals == 0] = 1
+        return (m @ self.sparse.diags(1 / totals)).tocsc()
+
+    # frequencies(): Each word's share of all the words counted in each year
+    def frequencies(self):
+        self.build()
+        return self.scaleColumns(self.byYear)
+
+    # change(): How much each word's share of the words counted went up
+    # (or, if negative, down) between two years
+    def change(self, fromYear, toYear):
+        self.build()
+        columns = self.numpy.searchsorted(self.years, [fromYear, toYear])
+        for year, column in zip((fromYear, toYear), columns):
+            if column >= len(self.years) or self.years[column] != year:
+                raise KeyError(year)
+        shares = self.scaleColumns(self.byYear[:, columns]).toarray()
+        return shares[:, 1] - shares[:, 0]
+
+    # topWords(): The k words with the highest values, highest first, as a
+    # list of (word, value) pairs. Ties go to the alphabetically first word.
+    def topWords(self, values, k):
+        np = self.numpy
+        k = min(k, len(values))
+        if k == 0:
+            return []
+        # Take every word tied with the kth highest so ties are broken by word
+        threshold = np.partition(values, len(values) - k)[len(values) - k]
+        top = np.flatnonzero(values >= threshold)
+        top = top[np.lexsort((top, -values[top]))][:k]
+        return [(str(self.words[i]), float(values[i])) for i in top]
+
+    # risers() and fallers(): The k words whose share of the words counted
+    # grew or shrank the most between two years
+    def risers(self, fromYear, toYear, k):
+        change = self.change(fromYear, toYear)
+        return [(x, y) for x,y in self.topWords(change, k) if y > 0]
+
+    def fallers(self, fromYear, toYear, k):
+        change = self.change(fromYear, toYear)
+        return [(x, -y) for x,y in self.topWords(-change, k) if y > 0]
+
+    # tfidf(): Weights each report's word counts by how few of the reports
+    # use the word, using the word's share of the report as the term
+    # frequency and the smoothed log((1 + n) / (1 + df)) + 1 as the inverse
+    # document frequency. Columns follow columnFilings.
+    def tfidf(self):
+        self.build()
+        np = self.numpy
+        reports = self.byFiling.shape[1]
+        used = np.diff(self.byFiling.tocsr().indptr)
+        idf = np.log((1 + reports) / (1 + used)) + 1
+        return (self.sparse.diags(idf) @ self.scaleColumns(self.byFiling)).tocsc()
+
+    # save(): Writes the matrices and their labels to a NumPy .npz file.
+    # byFiling is stored in compressed sparse column form as data, indices
+    # and indptr; byYear can be rebuilt from it with the year labels.
+    def save(self, path):
+        self.build()
+        np = self.numpy
+        np.savez_compressed(
+            path, data=self.byFiling.data, indices=self.byFiling.indices,
+            indptr=self.byFiling.indptr, shape=self.byFiling.shape,
+            words=self.words,
+            ciks=np.array([f.cik for f in self.columnFilings], dtype=str),
+            filing_ids=np.array([f.filingID for f in self.columnFilings],
+                                dtype=str),
+            years=np.array([f.year for f in self.columnFilings], np.int64))
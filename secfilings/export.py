@@ -0,0 +1,267 @@
+# export.py: The console summary and the output sinks that save the word
+# counts of each report. OpenPyXL, pyarrow, NumPy and SciPy are only
+# imported by the sinks that need them.
+
+import csv, gzip
+
+from .count import TermMatrix
+
+# printTopWords(): Outputs the top 10 words of a report (or of all of them)
+# to get an idea of where we might focus our analytical efforts later
+def printTopWords(top, source="this report"):
+    print("*** Top 10 words from " + source + " ***")
+    for x,y in top:
+        # Skip if bad unicode slipped past earlier checks
+        try:
+            print("\t" + x + " (" + str(y) + ")")
+        except UnicodeEncodeError:
+            continue
+
+# fillWorksheet(): Writes a report's dictionary into its worksheet
+def fillWorksheet(ws, d, title, year):
+    # Give the sheet a meaningful title -- the year of the report
+    ws.title = title
+    # Set an iterator to help us fill our worksheet
+    i = 1
+    # Add field labels to the worksheet
+    ws["A" + str(i)] = "Year"
+    ws["B" + str(i)] = "Word"
+    ws["C" + str(i)] = "Count"
+    # Put the dictionary into the workbook using the values as a key
+    # to sort the dictionary from highest word count to lowest
+    for x,y in sorted(d.items(), key = lambda x: x[1], reverse = True):
+        i = i + 1
+        ws["A" + str(i)] = year
+        ws["B" + str(i)] = x
+        ws["C" + str(i)] = y
+
+# streamWorksheet(): Adds a sheet for a report to a write-only workbook.
+# The rows go straight to a temporary file as they're appended, so memory
+# use doesn't grow with the number of words the way it does with
+# fillWorksheet(). Sheets appear in the order they're added.
+def streamWorksheet(wb, d, title, year):
+    ws = wb.create_sheet(title)
+    ws.append(["Year", "Word", "Count"])
+    for x,y in sorted(d.items(), key = lambda x: x[1], reverse = True):
+        ws.append([year, x, y])
+    ws.close()
+
+# The output sinks below all work the same way: add() is called with each
+# report's position in the list of filings and the word counts of each of
+# its sections (a dictionary keyed by Item number) as soon as they're
+# ready, in whatever order the reports finish. skip() is called instead
+# for reports that couldn't be processed, and close() is called once every
+# report has been added or skipped.
+
+# WorkbookSink: Saves one worksheet per report and section to an XLSX
+# workbook. Sheets are named after the year of the report, with the CIK in
+# front when the filings come from more than one company and the Item
+# number in front of that when more than one section is counted. A
+# report's sections are kept together.
+class WorkbookSink:
+    def __init__(self, path, filings, items, writeOnly):
+        from openpyxl import Workbook
+        self.path = path
+        self.filings = filings
+        self.items = items
+        self.writeOnly = writeOnly
+        self.showCIK = len(set(filing.cik for filing in filings)) > 1
+        self.added = 0
+        # Reports can finish in any order, so create the worksheets up front
+        # to keep them in year order. A write-only workbook can't do that,
+        # so its sheets are written once every earlier report is done, and
+        # reports that finish early wait in "ready" until then.
+        if writeOnly:
+            self.wb = Workbook(write_only=True)
+            self.ready = dict()
+            self.nextSheet = 1
+        else:
+            self.wb = Workbook()
+            self.sheets = [self.wb.active] + \
+                          [self.wb.create_sheet() for i in
+                           range(len(filings) * len(items) - 1)]
+
+    # sheetTitle(): Returns the name of the worksheet for a section of a
+    # report
+    def sheetTitle(self, count, key):
+        filing = self.filings[count - 1]
+        title = str(filing.year)
+        if self.showCIK:
+            title = filing.cik + " " + title
+        if len(self.items) > 1:
+            title = "Item " + key + " " + title
+        return title
+
+    def add(self, count, counts):
+        self.added = self.added + 1
+        if not self.writeOnly:
+            for i, key in enumerate(self.items):
+                sheet = (count - 1) * len(self.items) + i
+                fillWorksheet(self.sheets[sheet], counts[key],
+                              self.sheetTitle(count, key),
+                              self.filings[count - 1].year)
+                self.sheets[sheet] = None
+            return
+        self.ready[count] = counts
+        self.flush()
+
+    def skip(self, count):
+        if self.writeOnly:
+            self.ready[count] = None
+            self.flush()
+
+    # flush(): Writes every waiting report whose earlier reports are done
+    def flush(self):
+        while self.nextSheet in self.ready:
+            counts = self.ready.pop(self.nextSheet)
+            if counts is not None:
+                for key in self.items:
+                    streamWorksheet(self.wb, counts[key],
+                                    self.sheetTitle(self.nextSheet, key),
+                                    self.filings[self.nextSheet - 1].year)
+            self.nextSheet = self.nextSheet + 1
+
+    def close(self):
+        if self.added == 0:
+            print("No reports were processed, so " + self.path +
+                  " was not saved.")
+            return
+        # Drop the sheets of any reports that couldn't be processed
+        if not self.writeOnly:
+            for ws in self.sheets:
+                if ws is not None:
+                    self.wb.remove(ws)
+        self.wb.save(self.path)
+
+# TableSink: Saves every report's word counts to a single long-format table
+# with one (cik, year, filing_id, item, word, count) row per word and
+# section, which loads far more easily into pandas or Tableau than one sheet
+# per year. The table is written as Parquet when pyarrow is installed and
+# as gzip-compressed CSV otherwise. Rows are written as each report is
+# added, in the order reports finish.
+class TableSink:
+    def __init__(self, basePath, filings, items):
+        self.filings = filings
+        self.items = items
+        try:
+            import pyarrow, pyarrow.parquet
+        except ImportError:
+            pyarrow = None
+        if pyarrow is not None:
+            self.pyarrow = pyarrow
+            self.path = basePath + ".parquet"
+            self.schema = pyarrow.schema([("cik", pyarrow.string()),
+                                          ("year", pyarrow.int32()),
+                                          ("filing_id", pyarrow.string()),
+                                          ("item", pyarrow.string()),
+                                          ("word", pyarrow.string()),
+                                          ("count", pyarrow.int32())])
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self.pyarrow = None
+            self.path = basePath + ".csv.gz"
+            self.file = gzip.open(self.path, "wt", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["cik", "year", "filing_id", "item", "word",
+                                  "count"])
+
+    def add(self, count, counts):
+        filing = self.filings[count - 1]
+        for key in self.items:
+            rows = sorted(counts[key].items(), key = lambda x: x[1],
+                          reverse = True)
+            if self.pyarrow is None:
+                for x,y in rows:
+                    self.writer.writerow([filing.cik, filing.year,
+                                          filing.filingID, key, x, y])
+                continue
+            columns = [[filing.cik] * len(rows), [filing.year] * len(rows),
+                       [filing.filingID] * len(rows), [key] * len(rows),
+                       [x for x,y in rows], [y for x,y in rows]]
+            self.writer.write_table(self.pyarrow.Table.from_arrays(
+                [self.pyarrow.array(c, t.type)
+                 for c, t in zip(columns, self.schema)], schema=self.schema))
+
+    def skip(self, count):
+        pass
+
+    def close(self):
+        if self.pyarrow is not None:
+            self.writer.close()
+        else:
+            self.file.close()
+        print("Word counts saved to " + self.path + ".")
+
+# trendSize: How many words are listed for each comparison in the trend
+# report
+trendSize = 25
+
+# TrendSink: Collects every report's word counts in a TermMatrix, one for
+# each section. When the run is over, each matrix is saved to NAME.npz, and
+# NAME-trends.csv lists the words making up the largest share of each year's
+# words, the words that rose and fell the most between each pair of
+# consecutive years and each report's highest TF-IDF words.
+# When more than one section is counted, NAME has "-item" and the Item
+# number added to it for each of them.
+class TrendSink:
+    def __init__(self, basePath, filings, items):
+        self.basePath = basePath
+        self.filings = filings
+        self.items = items
+        self.matrices = dict((key, TermMatrix()) for key in items)
+
+    def add(self, count, counts):
+        for key in self.items:
+            self.matrices[key].add(self.filings[count - 1], counts[key])
+
+    def skip(self, count):
+        pass
+
+    def close(self):
+        for key in self.items:
+            if len(self.items) > 1:
+                self.save(self.matrices[key], self.basePath + "-item" + key,
+                          "Item " + key + " ")
+            else:
+                self.save(self.matrices[key], self.basePath, "")
+
+    # save(): Saves one section's matrix and trends
+    def save(self, matrix, basePath, section):
+        matrix.save(basePath + ".npz")
+        path = basePath + "-trends.csv"
+        with open(path, "w", -1, "utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["kind", "from_year", "to_year", "cik",
+                             "filing_id", "word", "value"])
+            years = [int(year) for year in matrix.years]
+            shares = matrix.frequencies()
+            for column, year in enumerate(years):
+                values = shares[:, column].toarray().ravel()
+                for x,y in matrix.topWords(values, trendSize):
+                    if y > 0:
+                        writer.writerow(["share", year, year, "", "", x,
+                                         "%.6g" % y])
+            for fromYear, toYear in zip(years, years[1:]):
+                for kind, words in (("riser", matrix.risers),
+                                    ("faller", matrix.fallers)):
+                    for x,y in words(fromYear, toYear, trendSize):
+                        writer.writerow([kind, fromYear, toYear, "", "", x,
+                                         "%.6g" % y])
+            weights = matrix.tfidf()
+            for column, filing in enumerate(matrix.columnFilings):
+                values = weights[:, column].toarray().ravel()
+                for x,y in matrix.topWords(values, trendSize):
+                    if y > 0:
+                        writer.writerow(["tfidf", filing.year, filing.year,
+                                         filing.cik, filing.filingID, x,
+                                         "%.6g" % y])
+        if len(years) > 1:
+            print("*** " + section + "Words rising the most from " +
+                  str(years[0]) + " to " + str(years[-1]) + " ***")
+            for x,y in matrix.risers(years[0], years[-1], 10):
+                try:
+                    print("\t" + x + " (+%.3f%%)" % (100 * y))
+                except UnicodeEncodeError:
+                    continue
+        print("Term matrix saved to " + basePath + ".npz and trends to " +
+              path + ".")
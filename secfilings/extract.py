@@ -0,0 +1,401 @@
+# extract.py: Reads a cached report's HTML a piece at a time, turns it into
+# lines of text and pulls the requested sections (Items) of the 10-K out of
+# them, all in a single pass. The HTML is parsed as it's read, so only the
+# requested sections are ever held in memory, and parsing stops as soon as
+# the last of them ends.
+
+import codecs, os, re
+from collections import Counter
+from html.parser import HTMLParser
+
+from .cache import FilingCache
+from .stats import StageTimer
+from .tokenize import countLemmas, lemma
+
+# declaredCharset: Finds the character set named by a <meta> tag
+declaredCharset = re.compile(rb"<meta[^>]+charset\s*=\s*[\"']?([-\w.:]+)",
+                             re.IGNORECASE)
+
+# pageEncoding(): Works out how a cached report's HTML is encoded. A byte
+# order mark or a character set declared near the top of the page is tried
+# first, then UTF-8 and finally Windows-1252, and the first one that can
+# decode the whole page wins. The page is decoded a piece at a time and
+# nothing is kept, so this is quick and uses very little memory.
+def pageEncoding(path):
+    candidates = []
+    with open(path, "rb") as file:
+        head = file.read(4096)
+    for bom, encoding in ((codecs.BOM_UTF8, "utf-8-sig"),
+                          (codecs.BOM_UTF16_LE, "utf-16"),
+                          (codecs.BOM_UTF16_BE, "utf-16")):
+        if head.startswith(bom):
+            candidates.append(encoding)
+    match = declaredCharset.search(head)
+    if match:
+        try:
+            candidates.append(codecs.lookup(str(match.group(1), "ascii")).name)
+        except LookupError:
+            pass
+    for encoding in candidates + ["utf-8", "windows-1252"]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(65536), b""):
+                    decoder.decode(chunk)
+            decoder.decode(b"", True)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return "windows-1252"
+
+# PageTextParser: Collects the text inside a page's <body> as the page is
+# fed to it, leaving out scripts and style sheets. This is the same text
+# BeautifulSoup's get_text() returns once the script and style elements
+# are removed, but without building a tree of the whole document.
+class PageTextParser(HTMLParser):
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.inBody = False
+        self.skipping = 0
+        self.pieces = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.inBody = True
+        elif tag in ("script", "style"):
+            self.skipping = self.skipping + 1
+
+    def handle_endtag(self, tag):
+        if tag == "body":
+            self.inBody = False
+        elif tag in ("script", "style") and self.skipping > 0:
+            self.skipping = self.skipping - 1
+
+    def handle_data(self, data):
+        if self.inBody and self.skipping == 0:
+            self.pieces.append(data)
+
+# pageText(): Hands out the text of a cached report a piece at a time while
+# the HTML is read from disk and parsed
+def pageText(path):
+    parser = PageTextParser()
+    decoder = codecs.getincrementaldecoder(pageEncoding(path))(errors="replace")
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(65536), b""):
+            parser.feed(decoder.decode(chunk))
+            yield "".join(parser.pieces)
+            del parser.pieces[:]
+    parser.feed(decoder.decode(b"", True))
+    parser.close()
+    yield "".join(parser.pieces)
+
+# textLines(): Hands out the lines of a report's text one at a time as the
+# pieces of text come in, exactly as they would come back from writing the
+# whole text to a file and reading it in text mode: "\r\n" and "\r" line
+# endings are turned into "\n".
+lineEnding = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)")
+def textLines(pieces):
+    rest = ""
+    for piece in pieces:
+        text = rest + piece
+        end = 0
+        for match in lineEnding.finditer(text):
+            line = match.group()
+            # A "\r" at the very end may be the first half of a "\r\n"
+            if match.end() == len(text) and line.endswith("\r"):
+                break
+            end = match.end()
+            if line.endswith("\r\n"):
+                line = line[:-2] + "\n"
+            elif line.endswith("\r"):
+                line = line[:-1] + "\n"
+            yield line
+        rest = text[end:]
+    if rest.endswith("\r"):
+        rest = rest[:-1] + "\n"
+    if rest:
+        yield rest
+
+# Characters and patterns used while scanning a report, set up once so
+# that each line can be cleaned up by a handful of passes in C instead of
+# character-by-character loops in Python.
+#
+# Non-ASCII spaces become normal spaces. A number of different Unicode
+# characters are incuded in this class, but the big culprit is the
+# non-breaking space (U+00A0). Failure to remove this causes some words to be
+# concatenated. While we're at it, we'll change forward slashes to spaces as
+# well so that words separated with a slash are parsed normally.
+spaceCharacters = "\u2002\u2003\u2007\u2008\u2009\u200A\u00A0/"
+# Unicode dashes become normal dashes
+dashCharacters = "\u2012\u2013\u2014\u2015\u2053"
+# Everything in string.punctuation except hyphens is dropped
+punctuationBytes = b'!"#$%&\'()*+,./:;<=>?@[\\]^_`{|}~'
+pageNumber = re.compile(r"^[0-9]+$", re.MULTILINE)
+itemHeading = re.compile(r"Item\s*([0-9]{1,2}[A-C]?)")
+
+# The Items of a 10-K in the order they appear, each with its title and a
+# pattern matching the end of a line that holds the title. Titles that
+# have changed over the years or that often wrap onto a second line are
+# matched by their last words.
+reportItems = (
+    ("1", "Business", r"Business"),
+    ("1A", "Risk Factors", r"Risk\s*Factors"),
+    ("1B", "Unresolved Staff Comments", r"Unresolved\s*Staff\s*Comments"),
+    ("2", "Properties", r"Properties"),
+    ("3", "Legal Proceedings", r"Legal\s*Proceedings"),
+    ("4", "Mine Safety Disclosures",
+     r"Mine\s*Safety\s*Disclosures|Vote\s*of\s*Security\s*Holders"),
+    ("5", "Market for Registrant's Common Equity",
+     r"Purchases\s*of\s*Equity\s*Securities|" +
+     r"Common\s*Equity\s*and\s*Related\s*Stockholder\s*Matters"),
+    ("6", "Selected Financial Data", r"Selected\s*Financial\s*Data"),
+    ("7", "Management's Discussion and Analysis",
+     r"Results\s*of\s*Operations"),
+    ("7A", "Quantitative and Qualitative Disclosures About Market Risk",
+     r"Disclosures\s*[Aa]bout\s*Market\s*Risk"),
+    ("8", "Financial Statements and Supplementary Data",
+     r"Financial\s*Statements\s*and\s*Supplementary\s*Data"),
+    ("9", "Changes in and Disagreements with Accountants",
+     r"Accounting\s*and\s*Financial\s*Disclosure"),
+    ("9A", "Controls and Procedures", r"Controls\s*and\s*Procedures"),
+    ("9B", "Other Information", r"Other\s*Information"),
+    ("10", "Directors, Executive Officers and Corporate Governance",
+     r"Corporate\s*Governance"),
+    ("11", "Executive Compensation", r"Executive\s*Compensation"),
+    ("12", "Security Ownership", r"Management\s*and\s*Related\s*" +
+     r"Stockholder\s*Matters"),
+    ("13", "Certain Relationships and Related Transactions",
+     r"Director\s*Independence"),
+    ("14", "Principal Accountant Fees and Services",
+     r"Accountant\s*Fees\s*and\s*Services"),
+    ("15", "Exhibits and Financial Statement Schedules",
+     r"Financial\s*Statement\s*Schedules"),
+    ("16", "Form 10-K Summary", r"Form\s*10-K\s*Summary"))
+itemOrder = dict((key, n) for n, (key, title, pattern) in enumerate(reportItems))
+# What may follow an Item's number on the line that starts the Item:
+# nothing, when the title is on a line of its own, or the title
+itemTitles = dict((key, re.compile(r"^$|(?:" + pattern + r")$"))
+                  for key, title, pattern in reportItems)
+
+# parseItems(): Turns a comma-separated list of Item numbers such as "1A,7"
+# (or "all") into a list of Item numbers in the order they appear in a
+# 10-K. Raises ValueError for anything that isn't an Item of a 10-K.
+def parseItems(text):
+    if text.strip().lower() == "all":
+        return [key for key, title, pattern in reportItems]
+    items = []
+    for key in text.upper().replace("ITEM", "").split(","):
+        key = key.strip()
+        if key not in itemOrder:
+            raise ValueError("there is no Item " + repr(key) + " in a 10-K")
+        if key not in items:
+            items.append(key)
+    return sorted(items, key = itemOrder.__getitem__)
+
+# normalizeLine(): Cleans up a line of report text: swaps odd spaces and
+# dashes for plain ones, trims the ends, then drops anything that can't be
+# represented with ASCII along with the punctuation. The trim has to come
+# before anything is dropped for the results to match the original
+# step-by-step version of this code. Once the line is plain ASCII,
+# bytes.translate() can delete the punctuation far faster than
+# str.translate(), which looks up every character in a dictionary.
+def normalizeLine(line):
+    for c in spaceCharacters:
+        line = line.replace(c, " ")
+    for c in dashCharacters:
+        line = line.replace(c, "-")
+    line = line.strip()
+    return str(line.encode("ascii", "ignore").translate(None, punctuationBytes),
+               "ascii")
+
+# normalizedLines(): Hands out each line that isn't blank, cleaned up by
+# normalizeLine(). A line may still end up empty once it's cleaned up.
+def normalizedLines(lines):
+    for line in lines:
+        if line.strip():
+            yield normalizeLine(line)
+
+# keepLines(): Passes lines along unchanged while also writing them to
+# httpfile<N>.txt for debugging
+def keepLines(lines, count):
+    try:
+        file = open("httpfile" + str(count) + ".txt", "wb")
+    except IOError:
+        print("Warning: Could not write httpfile" + str(count) + ".txt.")
+        yield from lines
+        return
+    with file:
+        for line in lines:
+            file.write(bytes(line, "utf-8"))
+            yield line
+
+# extractSections(): Pulls the sections with the given Item numbers out of
+# the cleaned-up, non-blank lines of a report's text in one pass, and
+# returns a dictionary with the lines of each section and how many times
+# each word appears in it. No more lines are asked for once every section
+# has ended.
+#
+# Each section is found the way the Risk Factors section always has been:
+# it starts after a line ending with its title, unless the very next line
+# is just a number, which means the title was in the table of contents.
+# It ends at the heading of a later Item: a line starting with that Item's
+# number and either ending there or ending with its title. A wrapped line
+# of prose that happens to start with "Item 7 of this Form 10-K" doesn't
+# count.
+def extractSections(lines, items, count, total):
+    items = sorted(items, key = itemOrder.__getitem__)
+    # One pattern finds the title of any section we're still looking for.
+    # Every title ends with a fixed word, so the pattern only needs to be
+    # tried on the few lines ending with one of those words, which
+    # str.endswith() picks out far faster than the pattern could.
+    patterns = [(key, pattern) for key, title, pattern in reportItems
+                if key in items]
+    headings = re.compile("(?:" + "|".join("(?P<i" + key + ">" + pattern + ")"
+                                           for key, pattern in patterns) +
+                          ")$")
+    endings = tuple(set(word for key, pattern in patterns
+                        for word in re.findall(r"([\w-]+)(?:\||$)", pattern)))
+    # How many times each word appears in each section. The words are only
+    # lemmatized and filtered once the sections are finished (by
+    # countLemmas()), which means doing that once per distinct word instead
+    # of once per use.
+    words = dict((key, Counter()) for key in items)
+    # The lines of each section, kept so they can be cached with the counts
+    sections = dict((key, []) for key in items)
+
+    # The sections whose titles we're still looking for, the sections whose
+    # titles were on the last line (which might be the table of contents)
+    # and the sections we're in now
+    looking = set(items)
+    pending = []
+    current = []
+    for line in lines:
+        found = None
+        started = []
+        if looking and line.endswith(endings):
+            match = headings.search(line)
+            if match and match.lastgroup[1:] in looking:
+                # The title of a section we haven't started yet. As long as
+                # the next line doesn't start with a number, we're in the
+                # right place.
+                key = match.lastgroup[1:]
+                looking.discard(key)
+                words[key].clear()
+                del sections[key][:]
+                started.append(key)
+                found = key
+
+        # The heading of a later Item ends each section before that Item
+        if current:
+            match = itemHeading.match(line)
+            if match and match.group(1) in itemOrder and \
+                    itemTitles[match.group(1)].search(
+                        line[match.end():].strip()):
+                order = itemOrder[match.group(1)]
+                ended = [key for key in current if itemOrder[key] < order]
+                if ended:
+                    found = match.group(1)
+                    current = [key for key in current if key not in ended]
+
+        # A section whose title was on the last line and is followed by a
+        # page number was listed in the table of contents -- a false
+        # positive. Keep looking for it. Otherwise we're in the section.
+        if pending:
+            if pageNumber.search(line):
+                print("False positive, continuing to search...")
+                looking.update(pending)
+            else:
+                current.extend(pending)
+
+        if found is not None:
+            print("Count " + str(count) + " of " + str(total) +
+                  " - Item " + found + " found.")
+        # If we've made it this far, we're counting words in every section
+        # we're in. We'll keep doing this until we hit one of the stop/reset
+        # conditions from above.
+        if current:
+            lineWords = line.lower().split()
+            for key in current:
+                # The following print statement can be un-commented for
+                # debugging
+                # print(key, line)
+                sections[key].append(line)
+                words[key].update(lineWords)
+        pending = started
+        if not looking and not pending and not current:
+            break
+
+    return dict((key, ("\n".join(sections[key]), words[key]))
+                for key in items)
+
+# analyzeFiling(): Returns a dictionary with the word counts of each of the
+# given sections (Item numbers) of a cached report, and caches them. Counts
+# found by an earlier run with the same settings are reused as they are,
+# and if any sections are missing, they're all found in one new pass. The
+# time spent in each stage and what was done there are added to timer:
+# "parse" is turning HTML into text, "normalize" splitting the text into
+# lines and cleaning them up, "scan" finding the sections and counting
+# their words, "lemmatize" turning those into counts of lemmas and "store"
+# caching the results.
+def analyzeFiling(digest, cache, settings, items, count, total, keepText,
+                  timer=None):
+    timer = timer or StageTimer()
+    previous = timer.switch("store")
+    analysis = cache.readAnalysis(digest, settings)
+    if all(key in analysis for key in items):
+        print("Count " + str(count) + " of " + str(total) +
+              " - Word counts loaded from cache.")
+        timer.count("analysis_cache_hits")
+        timer.switch(previous)
+        return dict((key, analysis[key][1]) for key in items)
+    path = cache.pagePath(digest)
+    timer.count("html_bytes", os.path.getsize(path))
+    hits, misses = lemma.hits, lemma.misses
+    timer.switch("scan")
+    lines = textLines(timer.timed("parse", pageText(path)))
+    if keepText:
+        lines = keepLines(lines, count)
+    lines = timer.timed("normalize", normalizedLines(lines), "lines")
+    sections = extractSections(lines, items, count, total)
+    timer.switch("lemmatize")
+    counts = dict()
+    for key, (section, words) in sections.items():
+        counts[key] = countLemmas(words)
+        analysis[key] = (section, counts[key])
+        timer.count("section_lines", section.count("\n") + 1 if section else 0)
+        timer.count("tokens", sum(words.values()))
+        timer.count("distinct_words", len(words))
+    timer.switch("store")
+    cache.storeAnalysis(digest, settings, analysis)
+    timer.switch(previous)
+    timer.count("lemma_hits", lemma.hits - hits)
+    timer.count("lemma_misses", lemma.misses - misses)
+    return counts
+
+# The filing cache used by a worker process, opened once by initWorker()
+workerCache = None
+
+# initWorker(): Prepares a worker process to analyze reports. When the
+# lemmas are saved between runs, the worker keeps track of the ones it
+# looks up so they can be saved too.
+def initWorker(cacheDir, lemmaCacheSize, lemmaCachePath):
+    global workerCache
+    workerCache = FilingCache(cacheDir, 0)
+    lemma.maxSize = lemmaCacheSize
+    if lemmaCachePath:
+        lemma.load(lemmaCachePath)
+        lemma.learned = dict()
+
+# analyzeInWorker(): Runs analyzeFiling() in a worker process. Only the word
+# counts and the timer for this report, which includes the worker's
+# lemmatizer cache statistics, are sent back to the main process, along
+# with any lemmas the worker has looked up since it last sent some (or
+# None if it isn't keeping track of them).
+def analyzeInWorker(digest, settings, items, count, total, keepText):
+    timer = StageTimer()
+    counts = analyzeFiling(digest, workerCache, settings, items, count, total,
+                           keepText, timer)
+    learned = lemma.learned
+    if learned is not None:
+        lemma.learned = dict()
+    return counts, timer, learned
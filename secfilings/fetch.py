@@ -0,0 +1,175 @@
+# fetch.py: Works out which filings to process and downloads them into the
+# filing cache. Downloads run on a small pool of threads, so requests to
+# the same host are spaced out by a HostRateLimiter and failed requests are
+# retried with exponential backoff.
+
+import csv, hashlib, threading, time
+from collections import namedtuple
+from http.client import HTTPException
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlparse
+from urllib.request import Request, urlopen
+
+from .stats import StageTimer
+
+# List of web pages for us to visit
+webPageList = ("http://investor.apple.com/secfiling.cfm?filingID=1047469-07-9340&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-08-224958&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-09-214859&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-10-238044&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-11-282113&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-12-444068&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-13-416534&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-14-383437&CIK=320193",
+               "http://investor.apple.com/secfiling.cfm?filingID=1193125-15-356351&CIK=320193")
+
+# Where a filing listed in a manifest is downloaded from, unless the
+# manifest or --url-template says otherwise
+filingURLTemplate = "http://investor.apple.com/secfiling.cfm?filingID={filing_id}&CIK={cik}"
+
+# HostRateLimiter: Spaces out requests so that no single host is contacted
+# more often than once every minInterval seconds, no matter how many
+# download threads are running.
+class HostRateLimiter:
+    def __init__(self, minInterval):
+        self.minInterval = minInterval
+        self.nextSlot = dict()
+        self.lock = threading.Lock()
+
+    # wait(): Blocks the calling thread until it may contact the given host
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.nextSlot.get(host, now))
+            self.nextSlot[host] = slot + self.minInterval
+        if slot > now:
+            time.sleep(slot - now)
+
+# urlKey(): Returns a hash of a report's whole URL, which identifies a
+# report nobody has given a filing ID
+def urlKey(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+# filingKey(): Returns the filing ID from a report's URL, which is what the
+# cache uses to recognize a report it has already downloaded. URLs without
+# a filing ID are identified by a hash of the whole URL instead.
+def filingKey(url):
+    filingID = parse_qs(urlparse(url).query).get("filingID")
+    if filingID:
+        return filingID[0]
+    return urlKey(url)
+
+# Filing: One report to process. The cik and filingID identify it, year is
+# the fiscal year it covers and url is where it can be downloaded.
+Filing = namedtuple("Filing", "cik filingID year url")
+
+# builtInFilings(): Turns a list of report URLs into filings. The first
+# report covers 2007, the next 2008 and so on.
+def builtInFilings(urls):
+    filings = []
+    for count, url in enumerate(urls, 1):
+        cik = parse_qs(urlparse(url).query).get("CIK", [""])[0]
+        filings.append(Filing(cik, filingKey(url), count + 2006, url))
+    return filings
+
+# readManifest(): Reads the list of filings to process from a CSV file with
+# cik, filing_id and year columns. Filings without a url column (or with an
+# empty one) are downloaded from urlTemplate.
+def readManifest(path, urlTemplate):
+    filings = []
+    with open(path, "r", -1, "utf-8", newline="") as file:
+        reader = csv.DictReader(file)
+        missing = {"cik", "filing_id", "year"} - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError("missing column(s) " + ", ".join(sorted(missing)))
+        for row in reader:
+            # A short row leaves the columns it's missing as None
+            for column in ("cik", "filing_id", "year"):
+                if not (row[column] or "").strip():
+                    raise ValueError("line " + str(reader.line_num) +
+                                     " has no " + column)
+            try:
+                year = int(row["year"])
+            except ValueError:
+                raise ValueError("line " + str(reader.line_num) +
+                                 " has a bad year: " + repr(row["year"]))
+            cik = row["cik"].strip()
+            filingID = row["filing_id"].strip()
+            url = (row.get("url") or "").strip() or \
+                  urlTemplate.format(cik=cik, filing_id=filingID)
+            filings.append(Filing(cik, filingID, year, url))
+    if not filings:
+        raise ValueError("no filings listed")
+    return filings
+
+# fetchPage(): Downloads a single page, retrying with an exponentially
+# growing delay when the connection fails, the response is cut short or
+# garbled, or the server reports a temporary problem. Client errors such as
+# 404 are not retried. Returns the page and
+# the response headers, or None in place of the page if the server says our
+# copy (described by the conditional request headers) is still current.
+# Time spent waiting for the rate limiter or a retry goes to the "throttle"
+# stage of timer, and time spent talking to the server to "download".
+def fetchPage(url, limiter, retries, backoff, timeout, headers, timer=None):
+    timer = timer or StageTimer()
+    host = urlparse(url).netloc
+    attempt = 0
+    previous = timer.switch("throttle")
+    try:
+        while True:
+            limiter.wait(host)
+            timer.switch("download")
+            try:
+                response = urlopen(Request(url, headers=headers),
+                                   timeout=timeout)
+                return response.read(), response.headers
+            except HTTPError as e:
+                if e.code == 304:
+                    return None, e.headers
+                if (e.code < 500 and e.code != 429) or attempt >= retries:
+                    raise
+            except (URLError, OSError, HTTPException):
+                if attempt >= retries:
+                    raise
+            timer.switch("throttle")
+            timer.count("retries")
+            time.sleep(backoff * (2 ** attempt))
+            attempt = attempt + 1
+    finally:
+        timer.switch(previous)
+
+# retrieveFiling(): Makes sure a report is in the cache and returns the hash
+# of its HTML. Cached reports are used as they are unless revalidate is set,
+# in which case the server is asked whether they have changed. A report
+# cached from a different URL is downloaded again.
+def retrieveFiling(filing, cache, limiter, args, timer=None):
+    timer = timer or StageTimer()
+    filingID = filing.filingID
+    url = filing.url
+    entry = cache.lookup(filingID, url)
+    if entry is not None and not args.revalidate:
+        cache.touch(filingID)
+        timer.count("page_cache_hits")
+        return entry["digest"]
+    if args.offline:
+        raise URLError("report " + filingID + " is not in the cache")
+    headers = dict()
+    if entry is not None:
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["lastModified"]:
+            headers["If-Modified-Since"] = entry["lastModified"]
+    html, responseHeaders = fetchPage(url, limiter, args.retries, args.backoff,
+                                      args.timeout, headers, timer)
+    timer.count("downloads")
+    if html is None:
+        cache.touch(filingID)
+        timer.count("not_modified")
+        return entry["digest"]
+    timer.count("download_bytes", len(html))
+    previous = timer.switch("store")
+    try:
+        return cache.store(filingID, url, html, responseHeaders.get("ETag"),
+                           responseHeaders.get("Last-Modified"))
+    finally:
+        timer.switch(previous)
@@ -0,0 +1,152 @@
+# index.py: A searchable index of the Risk Factors text of each report
+
+import sqlite3, sys, time
+from array import array
+
+from .extract import normalizeLine
+
+# SearchIndex: A SQLite database holding an inverted index of the Risk
+# Factors text of each report. For every word, the index lists the reports
+# that use it and the positions (counted in words from the start of the
+# section) where it appears, which is enough to find phrases as well as
+# single words without rereading any reports. The section text is kept
+# too so matches can be shown in context. A report is only reindexed when
+# its HTML or the analysis settings change.
+class SearchIndex:
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc INTEGER PRIMARY KEY,
+                cik TEXT NOT NULL,
+                filing_id TEXT NOT NULL,
+                year INTEGER,
+                source TEXT NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE (cik, filing_id));
+            CREATE INDEX IF NOT EXISTS documents_year ON documents (year);
+            CREATE TABLE IF NOT EXISTS terms (
+                term_id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                doc INTEGER NOT NULL,
+                positions BLOB NOT NULL,
+                PRIMARY KEY (term_id, doc)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc);""")
+        self.db.commit()
+
+    # current(): Tells whether a report is already indexed from the given
+    # source (the hash of its HTML and the analysis settings)
+    def current(self, filing, source):
+        row = self.db.execute("SELECT source FROM documents " +
+                              "WHERE cik = ? AND filing_id = ?",
+                              (filing.cik, filing.filingID)).fetchone()
+        return row is not None and row[0] == source
+
+    # add(): Indexes a report's Risk Factors text, replacing whatever was
+    # indexed for it before
+    def add(self, filing, source, section):
+        positions = dict()
+        for i, word in enumerate(section.lower().split()):
+            if word not in positions:
+                positions[word] = array("i")
+            positions[word].append(i)
+        db = self.db
+        with db:
+            row = db.execute("SELECT doc FROM documents " +
+                             "WHERE cik = ? AND filing_id = ?",
+                             (filing.cik, filing.filingID)).fetchone()
+            if row is not None:
+                doc = row[0]
+                db.execute("DELETE FROM postings WHERE doc = ?", (doc,))
+                db.execute("UPDATE documents SET year = ?, source = ?, " +
+                           "text = ? WHERE doc = ?",
+                           (filing.year, source, section, doc))
+            else:
+                doc = db.execute("INSERT INTO documents (cik, filing_id, " +
+                                 "year, source, text) VALUES (?, ?, ?, ?, ?)",
+                                 (filing.cik, filing.filingID, filing.year,
+                                  source, section)).lastrowid
+            db.executemany("INSERT OR IGNORE INTO terms (term) VALUES (?)",
+                           ((word,) for word in positions))
+            db.executemany("INSERT INTO postings (term_id, doc, positions) " +
+                           "SELECT term_id, ?, ? FROM terms WHERE term = ?",
+                           ((doc, p.tobytes(), word)
+                            for word, p in positions.items()))
+
+    # search(): Finds every report containing a word or phrase, optionally
+    # only from the years firstYear through lastYear. Returns a list of
+    # (cik, filing ID, year, doc, positions) tuples in year order, where
+    # positions lists where each match starts.
+    def search(self, phrase, firstYear=None, lastYear=None):
+        words = normalizeLine(phrase).lower().split()
+        if not words:
+            return []
+        termIDs = []
+        for word in words:
+            row = self.db.execute("SELECT term_id FROM terms WHERE term = ?",
+                                  (word,)).fetchone()
+            if row is None:
+                return []
+            termIDs.append(row[0])
+        # Start with the reports using the rarest word in the phrase, then
+        # keep the starting positions at which every other word follows
+        # at the right distance
+        postings = []
+        for offset, termID in enumerate(termIDs):
+            rows = self.db.execute(
+                "SELECT p.doc, p.positions, d.cik, d.filing_id, d.year " +
+                "FROM postings p JOIN documents d ON d.doc = p.doc " +
+                "WHERE p.term_id = ? AND d.year BETWEEN ? AND ?",
+                (termID, -sys.maxsize if firstYear is None else firstYear,
+                 sys.maxsize if lastYear is None else lastYear)).fetchall()
+            postings.append((len(rows), offset, rows))
+        postings.sort(key = lambda x: x[0])
+        results = []
+        first, offset, rows = postings[0]
+        others = [(o, {doc: p for doc, p, *_ in r}) for n, o, r in postings[1:]]
+        for doc, positions, cik, filingID, year in rows:
+            starts = [p - offset for p in array("i", positions)]
+            for o, other in others:
+                if doc not in other:
+                    starts = []
+                    break
+                following = set(array("i", other[doc]))
+                starts = [p for p in starts if p + o in following]
+            if starts:
+                results.append((cik, filingID, year, doc, starts))
+        results.sort(key = lambda x: (x[2], x[0], x[1]))
+        return results
+
+    # context(): The words of a report from position start to end
+    def context(self, doc, start, end):
+        row = self.db.execute("SELECT text FROM documents WHERE doc = ?",
+                              (doc,)).fetchone()
+        return " ".join(row[0].split()[max(start, 0):end])
+
+    def close(self):
+        self.db.close()
+
+# searchReports(): Prints the reports in the search index that contain a
+# word or phrase, with a few of the matches shown in context
+def searchReports(path, phrase, years):
+    index = SearchIndex(path)
+    firstYear, lastYear = years or (None, None)
+    started = time.perf_counter()
+    results = index.search(phrase, firstYear, lastYear)
+    elapsed = time.perf_counter() - started
+    length = len(phrase.split())
+    for cik, filingID, year, doc, starts in results:
+        print(str(year) + " (CIK " + cik + ", filing " + filingID + "): " +
+              str(len(starts)) + " match" + ("es" if len(starts) > 1 else ""))
+        for start in starts[:3]:
+            try:
+                print("\t... " + index.context(doc, start - 8,
+                                               start + length + 8) + " ...")
+            except UnicodeEncodeError:
+                continue
+    print(str(len(results)) + " report(s) found in %.2f ms." %
+          (elapsed * 1000))
+    index.close()
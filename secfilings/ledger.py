@@ -0,0 +1,96 @@
+# ledger.py: The job ledger that lets an interrupted run pick up where it
+# left off
+
+import json, os, sqlite3, time
+
+# Ledger: A SQLite database recording how far each filing has got. A filing
+# is "fetched" once its HTML is in the filing cache, "counted" once the word
+# counts of its sections are stored in the ledger and "exported" once they
+# have made it into saved output; "failed" filings are tried again on the next run.
+# Every change is committed as soon as it happens, so an interrupted run
+# loses no finished work and the next run only does what's left.
+# A ledger can only be used by the thread that opened it unless anyThread
+# is set, in which case the caller must make sure only one thread uses it
+# at a time.
+class Ledger:
+    def __init__(self, path, anyThread=False):
+        self.db = sqlite3.connect(path, check_same_thread=not anyThread)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS filings (
+                               cik TEXT NOT NULL,
+                               filing_id TEXT NOT NULL,
+                               year INTEGER,
+                               state TEXT NOT NULL,
+                               digest TEXT,
+                               settings TEXT,
+                               counts TEXT,
+                               error TEXT,
+                               attempts INTEGER NOT NULL DEFAULT 0,
+                               updated REAL,
+                               PRIMARY KEY (cik, filing_id))""")
+        self.db.commit()
+
+    # lookup(): Returns a filing's state, HTML hash, analysis settings and
+    # the word counts of its sections (keyed by Item number), or None if
+    # the ledger has never seen the filing
+    def lookup(self, filing):
+        row = self.db.execute("SELECT state, digest, settings, counts " +
+                              "FROM filings WHERE cik = ? AND filing_id = ?",
+                              (filing.cik, filing.filingID)).fetchone()
+        if row is None:
+            return None
+        state, digest, settings, counts = row
+        if counts is not None:
+            counts = json.loads(counts)
+        return state, digest, settings, counts
+
+    # update(): Moves a filing to a new state. Values passed as None leave
+    # what's already recorded alone.
+    def update(self, filing, state, digest=None, settings=None, counts=None,
+               error=None):
+        if counts is not None:
+            counts = json.dumps(counts)
+        self.db.execute("""INSERT INTO filings (cik, filing_id, year, state,
+                                                digest, settings, counts,
+                                                error, attempts, updated)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT (cik, filing_id) DO UPDATE SET
+                               year = excluded.year,
+                               state = excluded.state,
+                               digest = COALESCE(excluded.digest, digest),
+                               settings = COALESCE(excluded.settings, settings),
+                               counts = COALESCE(excluded.counts, counts),
+                               error = excluded.error,
+                               attempts = attempts + excluded.attempts,
+                               updated = excluded.updated""",
+                        (filing.cik, filing.filingID, filing.year, state,
+                         digest, settings, counts, error,
+                         1 if state == "failed" else 0, time.time()))
+        self.db.commit()
+
+    # exported(): Marks filings as having made it into saved output
+    def exported(self, filings):
+        self.db.executemany("UPDATE filings SET state = 'exported', " +
+                            "updated = ? WHERE cik = ? AND filing_id = ?",
+                            [(time.time(), filing.cik, filing.filingID)
+                             for filing in filings])
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+# resumeStep(): Decides where an earlier run left a filing, given its ledger
+# entry. Returns "reuse" if the word counts of all the given sections were
+# recorded with the current analysis settings, "analyze" if its HTML was
+# fetched and is still in the filing cache, or "download" otherwise. With
+# revalidate set, every filing is downloaded again.
+def resumeStep(entry, settings, items, cache, revalidate):
+    if entry is None or revalidate:
+        return "download"
+    state, digest, counted, counts = entry
+    if state in ("counted", "exported") and counted == settings and \
+            all(key in counts for key in items):
+        return "reuse"
+    if state == "fetched" and os.path.exists(cache.pagePath(digest)):
+        return "analyze"
+    return "download"
@@ -0,0 +1,427 @@
+# service.py: The "serve" command's HTTP service, which answers queries
+# about filings without a whole run each time. The lemmatizer is loaded
+# once, and the word counts of recently used filings are kept in memory, so
+# a query about a filing that's been seen before is answered in
+# milliseconds. Anything not in memory comes from the job ledger, the
+# filing cache or, as a last resort, a fresh download and analysis.
+
+import json, threading, time, traceback
+from collections import OrderedDict
+from http.client import HTTPException
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import URLError
+from urllib.parse import parse_qs, urlsplit
+
+from .count import compareCounts, topWords
+from .extract import analyzeFiling, parseItems
+from .fetch import Filing, retrieveFiling, urlKey
+from .tokenize import lemma
+
+# LRUCache: A dictionary holding at most maxSize entries, which forgets the
+# least recently used ones first. Any number of threads can share it.
+class LRUCache:
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    # get(): Returns the entry for a key, or None if there isn't one
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    # put(): Adds or replaces the entry for a key
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+# ServiceError: A query that can't be answered, along with the HTTP status
+# to answer it with
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+# intParameter(): Reads a whole number from a query's parameters
+def intParameter(query, name, default=None):
+    value = query.get(name)
+    if value is None or value == "":
+        if default is None:
+            raise ServiceError(400, "missing parameter " + repr(name))
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ServiceError(400, "parameter " + repr(name) +
+                           " must be a whole number")
+
+# AnalysisService: Answers the queries. Each filing's word counts are kept
+# in memory by section (Item number) once they've been found, and new ones
+# are recorded in the job ledger, so "run" can pick them up too.
+#
+# Queries are answered on many threads at once. Downloads run side by side,
+# but only one report is analyzed at a time because the lemmatizer and its
+# cache are shared, and the ledger is only used by one thread at a time.
+# Queries about the same filing wait for each other, so a filing that's
+# asked about twice at once is still only downloaded and analyzed once.
+class AnalysisService:
+    def __init__(self, filings, cache, ledger, settings, items, limiter,
+                 args):
+        self.filings = list(filings)
+        self.cache = cache
+        self.ledger = ledger
+        self.settings = settings
+        self.items = items
+        self.limiter = limiter
+        self.args = args
+        self.memory = LRUCache(args.memory_size)
+        self.analysisLock = threading.Lock()
+        self.ledgerLock = threading.Lock()
+        self.filingsLock = threading.Lock()
+        self.filingLocks = dict()
+        # How many times word counts came from each place
+        self.sources = {"memory": 0, "ledger": 0, "analysis": 0}
+        self.started = time.time()
+
+    # filingLock(): Returns the lock held while a filing is being worked on
+    def filingLock(self, filing):
+        with self.filingsLock:
+            return self.filingLocks.setdefault((filing.cik, filing.filingID),
+                                               threading.Lock())
+
+    # findFilings(): Returns the filings a query is about: the one with the
+    # given filing_id, or those from the given year, in either case only
+    # from the given cik if there is one
+    def findFilings(self, query):
+        cik = query.get("cik")
+        with self.filingsLock:
+            filings = [filing for filing in self.filings
+                       if cik is None or filing.cik == cik]
+        if query.get("filing_id"):
+            filings = [filing for filing in filings
+                       if filing.filingID == query["filing_id"]]
+            name = "filing " + query["filing_id"]
+        elif query.get("year"):
+            year = intParameter(query, "year")
+            filings = [filing for filing in filings if filing.year == year]
+            name = "filing from " + str(year)
+        else:
+            raise ServiceError(400, "give a filing_id or a year")
+        if not filings:
+            raise ServiceError(404, "there is no " + name +
+                               (" for CIK " + cik if cik else ""))
+        return filings
+
+    # findFiling(): Returns the one filing a query is about
+    def findFiling(self, query):
+        filings = self.findFilings(query)
+        if len(filings) > 1:
+            raise ServiceError(400, "that matches " + str(len(filings)) +
+                               " filings; give a cik or filing_id")
+        return filings[0]
+
+    # sections(): Returns the Item numbers a query asks for
+    def sections(self, query, name, default):
+        try:
+            return parseItems(query[name]) if query.get(name) else default
+        except ValueError as e:
+            raise ServiceError(400, str(e))
+
+    # wordCounts(): Returns the word counts of the given sections of a
+    # filing, keyed by Item number, and where they came from: "memory",
+    # "ledger" or "analysis"
+    def wordCounts(self, filing, items):
+        key = (filing.cik, filing.filingID)
+        source = "memory"
+        counts = self.memory.get(key)
+        if counts is None or not all(item in counts for item in items):
+            with self.filingLock(filing):
+                counts, source = self.findWordCounts(filing, items)
+        with self.filingsLock:
+            self.sources[source] = self.sources[source] + 1
+        return counts, source
+
+    # findWordCounts(): Does the work of wordCounts() for a filing whose
+    # counts aren't all in memory. Must be called with its filingLock held.
+    def findWordCounts(self, filing, items):
+        key = (filing.cik, filing.filingID)
+        # Another query may have found them while this one was waiting
+        counts = dict(self.memory.get(key) or dict())
+        if all(item in counts for item in items):
+            return counts, "memory"
+        with self.ledgerLock:
+            entry = self.ledger.lookup(filing)
+        if entry is not None and not self.args.revalidate:
+            state, digest, counted, ledgerCounts = entry
+            if state in ("counted", "exported") and \
+                    counted == self.settings and ledgerCounts:
+                for item, d in ledgerCounts.items():
+                    counts.setdefault(item, d)
+                if all(item in counts for item in items):
+                    self.memory.put(key, counts)
+                    return counts, "ledger"
+        try:
+            digest = retrieveFiling(filing, self.cache, self.limiter,
+                                    self.args)
+        # A filing's url can also be malformed (ValueError) or the response
+        # cut short (HTTPException)
+        except (URLError, OSError, HTTPException, ValueError) as e:
+            with self.ledgerLock:
+                self.ledger.update(filing, "failed", error=str(e))
+            raise ServiceError(502, "could not download filing " +
+                               filing.filingID + " (" + str(e) + ")")
+        missing = [item for item in items if item not in counts]
+        with self.filingsLock:
+            total = len(self.filings)
+            count = self.filings.index(filing) + 1 \
+                    if filing in self.filings else total + 1
+        try:
+            with self.analysisLock:
+                found = analyzeFiling(digest, self.cache, self.settings,
+                                      missing, count, total, False)
+        # One malformed report shouldn't stop the service
+        except Exception as e:
+            with self.ledgerLock:
+                self.ledger.update(filing, "failed", digest,
+                                   error=str(e))
+            raise ServiceError(500, "could not analyze filing " +
+                               filing.filingID + " (" + str(e) + ")")
+        counts.update(found)
+        with self.ledgerLock:
+            self.ledger.update(filing, "counted", digest, self.settings,
+                               counts)
+        self.memory.put(key, counts)
+        return counts, "analysis"
+
+    # status(): GET / - what the service holds and how it's been doing
+    def status(self, query):
+        with self.filingsLock:
+            filings = len(self.filings)
+            sources = dict(self.sources)
+        return {"filings": filings,
+                "sections": self.items,
+                "settings": self.settings,
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "in_memory": len(self.memory),
+                "memory_size": self.memory.maxSize,
+                "answered_from": sources,
+                "lemmatizer": {"words": len(lemma.lemmas),
+                               "hits": lemma.hits,
+                               "misses": lemma.misses}}
+
+    # listFilings(): GET /filings - the filings the service knows about
+    def listFilings(self, query):
+        with self.filingsLock:
+            filings = list(self.filings)
+        return {"filings": [{"cik": filing.cik,
+                             "filing_id": filing.filingID,
+                             "year": filing.year,
+                             "url": filing.url,
+                             "in_memory": self.memory.get(
+                                 (filing.cik, filing.filingID)) is not None}
+                            for filing in filings]}
+
+    # analyze(): POST /analyze - finds the word counts of a filing's
+    # sections, if that hasn't been done already, and returns the top words
+    # of each. The filing is named by filing_id or year (and cik), or is a
+    # new one given by its http or https url and year, whose filing_id is
+    # then a hash of the url. A new filing is added to the filings the
+    # service knows about once its words are counted.
+    def analyze(self, query):
+        new = False
+        if query.get("url"):
+            year = intParameter(query, "year")
+            if urlsplit(query["url"]).scheme.lower() not in ("http", "https"):
+                raise ServiceError(400, "url must be an http or https address")
+            # The filing is named by a hash of its url rather than a filing
+            # ID in the url, which would let any url take the place of a
+            # filing that's already cached
+            filing = Filing(query.get("cik") or "", urlKey(query["url"]),
+                            year, query["url"])
+            with self.filingsLock:
+                known = [f for f in self.filings
+                         if f.url == filing.url and
+                            (not query.get("cik") or f.cik == filing.cik)]
+            if known:
+                filing = known[0]
+            else:
+                new = True
+        else:
+            filing = self.findFiling(query)
+        items = self.sections(query, "sections", self.items)
+        top = intParameter(query, "top", 10)
+        counts, source = self.wordCounts(filing, items)
+        if new:
+            with self.filingsLock:
+                if filing not in self.filings:
+                    self.filings.append(filing)
+        return {"cik": filing.cik,
+                "filing_id": filing.filingID,
+                "year": filing.year,
+                "source": source,
+                "sections": dict((key, {"distinct_words": len(counts[key]),
+                                        "words": sum(counts[key].values()),
+                                        "top": topWords(counts[key], top)})
+                                 for key in items)}
+
+    # counts(): GET /counts - the word counts of one section of a filing,
+    # most frequent first, or only the top ones if top is given
+    def counts(self, query):
+        filing = self.findFiling(query)
+        item = self.sections(query, "section", self.items[:1])
+        if len(item) != 1:
+            raise ServiceError(400, "give a single section")
+        item = item[0]
+        counts, source = self.wordCounts(filing, [item])
+        d = counts[item]
+        return {"cik": filing.cik,
+                "filing_id": filing.filingID,
+                "year": filing.year,
+                "section": item,
+                "source": source,
+                "counts": topWords(d, intParameter(query, "top", len(d)))}
+
+    # compare(): GET /compare - the words whose share of one section grew
+    # and shrank the most between two years, counting every filing from
+    # each year (or only those from the given cik). Filings that can't be
+    # downloaded or analyzed are left out and listed, as "run" does.
+    def compare(self, query):
+        item = self.sections(query, "section", self.items[:1])
+        if len(item) != 1:
+            raise ServiceError(400, "give a single section")
+        item = item[0]
+        top = intParameter(query, "top", 25)
+        result = {"section": item}
+        years = []
+        for name in ("from", "to"):
+            year = str(intParameter(query, name))
+            filings = self.findFilings({"cik": query.get("cik"),
+                                        "year": year})
+            total = dict()
+            counted = []
+            failed = []
+            for filing in filings:
+                try:
+                    counts, source = self.wordCounts(filing, [item])
+                except ServiceError as e:
+                    failed.append({"filing_id": filing.filingID,
+                                   "error": str(e)})
+                    continue
+                for word, n in counts[item].items():
+                    total[word] = total.get(word, 0) + n
+                counted.append(filing.filingID)
+            if not counted:
+                raise ServiceError(502, "none of the filings from " + year +
+                                   " could be counted (" +
+                                   failed[0]["error"] + ")")
+            years.append(total)
+            result[name] = {"year": int(year), "filings": counted,
+                            "failed": failed}
+        risers, fallers = compareCounts(years[0], years[1], top)
+        result["risers"] = risers
+        result["fallers"] = fallers
+        return result
+
+    # close(): Saves the lemma cache, if there is one, and closes the
+    # ledger once any analysis under way has finished
+    def close(self):
+        with self.analysisLock, self.ledgerLock:
+            self.ledger.close()
+            if self.args.lemma_cache:
+                try:
+                    lemma.save(self.args.lemma_cache)
+                except IOError:
+                    print("Warning: Could not save the lemma cache to " +
+                          self.args.lemma_cache + ".")
+
+# The service's endpoints, by method and path
+endpoints = {("GET", "/"): AnalysisService.status,
+             ("GET", "/filings"): AnalysisService.listFilings,
+             ("POST", "/analyze"): AnalysisService.analyze,
+             ("GET", "/counts"): AnalysisService.counts,
+             ("GET", "/compare"): AnalysisService.compare}
+
+# ServiceHandler: Answers one HTTP request with JSON. Parameters come from
+# the query string and, for POST, a JSON object in the body. Every answer
+# says how many milliseconds it took; failed queries are answered with an
+# error message instead.
+class ServiceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.answer("GET")
+
+    def do_POST(self):
+        self.answer("POST")
+
+    def answer(self, method):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        query = dict((name, values[-1]) for name, values in
+                     parse_qs(url.query).items())
+        try:
+            if method == "POST":
+                query.update(self.readBody())
+            endpoint = endpoints.get((method, url.path))
+            if endpoint is None:
+                if any(path == url.path for method, path in endpoints):
+                    raise ServiceError(405, "use " + ("GET" if method ==
+                                       "POST" else "POST") + " for " +
+                                       url.path)
+                raise ServiceError(404, "there is nothing at " + url.path)
+            status, result = 200, endpoint(self.server.service, query)
+        except ServiceError as e:
+            status, result = e.status, {"error": str(e)}
+        # A bug shouldn't leave the client without an answer
+        except Exception as e:
+            traceback.print_exc()
+            status, result = 500, {"error": "internal error (" + str(e) + ")"}
+        result["milliseconds"] = round((time.perf_counter() - started) * 1000,
+                                       3)
+        data = bytes(json.dumps(result), "utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # readBody(): Returns the parameters in a POST request's JSON body as
+    # strings, the way they'd come in a query string. Lists, such as a list
+    # of sections, are joined with commas.
+    def readBody(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise ServiceError(400, "Content-Length must be a whole number " +
+                               "of bytes")
+        if not length:
+            return dict()
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            raise ServiceError(400, "the request body isn't valid JSON")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "the request body must be a JSON object")
+        return dict((name, ",".join(str(x) for x in value)
+                     if isinstance(value, list) else str(value))
+                    for name, value in body.items() if value is not None)
+
+# ServiceServer: Listens for queries and answers each one on its own
+# thread. The queue of connections waiting to be accepted is longer than
+# the standard five, so a burst of quick queries from many clients isn't
+# turned away.
+class ServiceServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+    def __init__(self, address, service):
+        ThreadingHTTPServer.__init__(self, address, ServiceHandler)
+        self.service = service
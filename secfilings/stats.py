@@ -0,0 +1,136 @@
+# stats.py: Timing and counters for each stage of processing a report, and
+# the optional profiler hook. Each report gets its own StageTimer, filled in
+# by whichever thread or process is working on it at the time, and the
+# timers are gathered into a JSON run report at the end of the run.
+
+import json, os, sys, time
+
+# StageTimer: Adds up the time spent in each stage of processing a report,
+# along with counts of things like lines scanned and cache hits. Only one
+# stage runs at a time: switch() stops the clock on the current stage and
+# starts it on another, so time spent in a stage nested inside another
+# (parsing HTML while handing out lines, say) is only counted once.
+class StageTimer:
+    def __init__(self):
+        self.seconds = dict()
+        self.counts = dict()
+        self.stage = None
+        self.since = 0.0
+
+    # switch(): Starts timing a new stage (or none) and returns the stage
+    # that was being timed until now
+    def switch(self, stage):
+        now = time.perf_counter()
+        previous = self.stage
+        if previous is not None:
+            self.seconds[previous] = self.seconds.get(previous, 0.0) + \
+                                     now - self.since
+        self.stage = stage
+        self.since = now
+        return previous
+
+    # count(): Adds n to one of the counters
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    # timed(): Hands out the items of an iterator, charging the time taken
+    # to produce each one to the given stage. If counter is given, it counts
+    # the items too.
+    def timed(self, stage, items, counter=None):
+        items = iter(items)
+        while True:
+            previous = self.switch(stage)
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                self.switch(previous)
+            if counter is not None:
+                self.counts[counter] = self.counts.get(counter, 0) + 1
+            yield item
+
+    # merge(): Adds in the times and counts of another timer, such as one
+    # filled in by a worker process
+    def merge(self, other):
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        for name, n in other.counts.items():
+            self.count(name, n)
+
+# peakMemory(): Returns the most memory, in megabytes, that this process
+# has used at once and the most used by any of its finished worker
+# processes, or None for both where that can't be found out (on Windows)
+def peakMemory():
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # ru_maxrss is in kilobytes, except on macOS where it's in bytes
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    main = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return main / scale, workers / scale
+
+# writeRunReport(): Saves a run report as JSON. Times are rounded to the
+# microsecond to keep the file readable.
+def writeRunReport(path, report):
+    def rounded(value):
+        if isinstance(value, float):
+            return round(value, 6)
+        if isinstance(value, dict):
+            return {k: rounded(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [rounded(v) for v in value]
+        return value
+    temp = path + ".tmp"
+    with open(temp, "w", -1, "utf-8") as file:
+        json.dump(rounded(report), file, indent=1)
+    os.replace(temp, path)
+
+# StageProfiler: Profiles every call made in one chosen stage of a run, with
+# cProfile or, if asked for, pyinstrument, and saves the results to path
+# once the run is over. Raises ImportError if pyinstrument isn't installed.
+class StageProfiler:
+    def __init__(self, stage, tool, path):
+        self.stage = stage
+        self.tool = tool
+        self.path = path
+        if tool == "pyinstrument":
+            import pyinstrument
+            self.profiler = pyinstrument.Profiler()
+        else:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    # call(): Runs function(*args), profiling it if it belongs to the chosen
+    # stage, and returns what it returns
+    def call(self, stage, function, *args):
+        if stage != self.stage:
+            return function(*args)
+        if self.tool == "pyinstrument":
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+        try:
+            return function(*args)
+        finally:
+            if self.tool == "pyinstrument":
+                self.profiler.stop()
+            else:
+                self.profiler.disable()
+
+    # save(): Writes the profile to disk and prints a short summary. A
+    # cProfile profile is saved in pstats format and a pyinstrument one as
+    # an HTML page.
+    def save(self):
+        print("*** Profile of the " + self.stage + " stage ***")
+        if self.tool == "pyinstrument":
+            with open(self.path, "w", -1, "utf-8") as file:
+                file.write(self.profiler.output_html())
+            print(self.profiler.output_text())
+        else:
+            import pstats
+            self.profiler.dump_stats(self.path)
+            pstats.Stats(self.profiler).sort_stats("cumulative").print_stats(15)
+        print("Profile saved to " + self.path + ".")
@@ -0,0 +1,132 @@
+# tokenize.py: Turns the words of a report into the lemmas that get
+# counted, leaving out numbers, short words and stopwords. nltk is only
+# imported the first time a word is actually lemmatized.
+
+import hashlib, importlib, json, os, re
+from collections import OrderedDict
+
+# CachingLemmatizer: Remembers the lemmas of recently seen words so that
+# each distinct word only has to be looked up in WordNet once. At most
+# maxSize words are kept; the least recently used ones are forgotten first.
+# The lemmatizer is named by its module and class, and isn't created (or
+# its module imported) until start() is called or the first lookup misses.
+# While learned is a dictionary, every word looked up in WordNet is also
+# added to it, so a worker process can send its new lemmas back to the main
+# process.
+class CachingLemmatizer:
+    def __init__(self, lemmatizerName, maxSize):
+        self.lemmatizerName = lemmatizerName
+        self.lemmatizer = None
+        self.maxSize = maxSize
+        self.lemmas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.learned = None
+
+    # start(): Creates the lemmatizer if that hasn't been done yet and
+    # returns it
+    def start(self):
+        if self.lemmatizer is None:
+            module, name = self.lemmatizerName.rsplit(".", 1)
+            self.lemmatizer = getattr(importlib.import_module(module), name)()
+        return self.lemmatizer
+
+    # lemmatize(): Returns the lemma of a single word
+    def lemmatize(self, word):
+        try:
+            result = self.lemmas[word]
+        except KeyError:
+            self.misses = self.misses + 1
+            result = (self.lemmatizer or self.start()).lemmatize(word)
+            self.lemmas[word] = result
+            if len(self.lemmas) > self.maxSize:
+                self.lemmas.popitem(last=False)
+            if self.learned is not None:
+                self.learned[word] = result
+            return result
+        self.hits = self.hits + 1
+        self.lemmas.move_to_end(word)
+        return result
+
+    # lemmatizeAll(): Returns the lemmas of a list of words, looking up
+    # each distinct word only once
+    def lemmatizeAll(self, words):
+        found = dict()
+        for word in words:
+            if word not in found:
+                found[word] = self.lemmatize(word)
+        return [found[word] for word in words]
+
+    # learn(): Remembers lemmas looked up somewhere else, such as in a worker
+    # process, as the most recently used
+    def learn(self, lemmas):
+        for word, result in lemmas.items():
+            self.lemmas[word] = result
+            self.lemmas.move_to_end(word)
+        while len(self.lemmas) > self.maxSize:
+            self.lemmas.popitem(last=False)
+
+    # load(): Reads the lemmas saved by an earlier run, if there are any
+    def load(self, path):
+        try:
+            with open(path, "r", -1, "utf-8") as file:
+                pairs = json.load(file)
+        except (IOError, ValueError):
+            return
+        for word, result in pairs[-self.maxSize:]:
+            self.lemmas[word] = result
+
+    # save(): Writes the remembered lemmas to disk for the next run
+    def save(self, path):
+        temp = path + ".tmp"
+        with open(temp, "w", -1, "utf-8") as file:
+            json.dump(list(self.lemmas.items()), file)
+        os.replace(temp, path)
+
+# A lemmatizer to help reduce dictionary clutter
+lemma = CachingLemmatizer("nltk.stem.wordnet.WordNetLemmatizer", 100000)
+# A (mostly) generic list of stopwords
+stopWords = ("a","able","about","across","after","all","almost",
+             "also","am","among","an","and","any","are","as",
+             "at","be","because","been","but","by","can","cannot",
+             "company","companys","could","dear","did","do","does","either",
+             "else","ever","every","for","from","get","got","had","has",
+             "have","he","her","hers","him","his","how","however",
+             "i","if","in","into", "is","it","its","just","least",
+             "let","like","likely","may","me","might","most",
+             "must","my","neither","new","no","nor","not","of","off",
+             "often","on","only","or","other","our","own","rather",
+             "said","say","says","she","should","since","so","some",
+             "such","than","that","the","their","them","then","there",
+             "these","they","this","tis","to","too","twas","us",
+             "wants","was","we","were","what","when","where","which",
+             "while","who","whom","why","will","with","would","yet",
+             "you","your")
+# Bump this whenever the way sections are found or lines are cleaned up,
+# split into words or filtered changes, so that cached word counts from
+# older versions are ignored. Changes to stopWords or the lemmatizer are
+# picked up on their own.
+pipelineVersion = "3"
+
+# analysisSettings(): Returns a short fingerprint of everything that affects
+# the word counts, used to tell cached results from different settings apart
+def analysisSettings():
+    settings = [pipelineVersion, list(stopWords), lemma.lemmatizerName]
+    return hashlib.sha256(bytes(json.dumps(settings), "utf-8")).hexdigest()[:16]
+
+hasDigit = re.compile(r"[0-9]")
+
+# countLemmas(): Turns the counts of the words in a section into a
+# dictionary of counts of their lemmas, in the order the lemmas first
+# appear in the section
+def countLemmas(words):
+    d = dict()
+    # Lemmatize the words to reduce dictionary clutter.
+    for word, n in zip(lemma.lemmatizeAll(list(words)), words.values()):
+        # Get rid of any words that are numbers or have numbers in
+        # them. Finally, get rid of any words on our stopword list
+        # and any other words with less than 3 characters.
+        if hasDigit.search(word) or len(word) < 3 or word in(stopWords):
+            continue
+        d[word] = d.get(word, 0) + n
+    return d
@@ -0,0 +1,60 @@
+# test_count.py: Checks the ways count.py holds and queries word counts
+# against each other. The TermMatrix tests need NumPy and SciPy and are
+# skipped without them. Run with "python -m pytest" from the folder above
+# this one.
+
+import random, unittest
+
+from secfilings.count import TermMatrix, compareCounts
+from secfilings.fetch import Filing
+
+# NumPy and SciPy are imported when the first TermMatrix is created
+try:
+    TermMatrix()
+    haveNumPy = True
+except ImportError:
+    haveNumPy = False
+
+# randomCounts(): Word counts drawn from a small vocabulary with small
+# counts, so plenty of words end up with the same change in share
+def randomCounts(rng):
+    words = ["w" + str(n) for n in range(rng.randint(0, 30))]
+    return dict((word, rng.randint(1, 4))
+                for word in rng.sample(words, rng.randint(0, len(words))))
+
+class CompareCountsTest(unittest.TestCase):
+    def testRisersAndFallers(self):
+        old = {"risk": 2, "supply": 2}
+        new = {"risk": 1, "supply": 2, "litigation": 1}
+        self.assertEqual(compareCounts(old, new, 5),
+                         ([("litigation", 0.25)],
+                          [("risk", -0.25)]))
+        self.assertEqual(compareCounts({}, {}, 5), ([], []))
+
+    # compareCounts() gives the same words and values, in the same order,
+    # as TermMatrix.risers() and fallers() with the counts of every filing
+    # from each year added together
+    @unittest.skipUnless(haveNumPy, "needs NumPy and SciPy")
+    def testMatchesTermMatrix(self):
+        rng = random.Random(20)
+        for n in range(200):
+            matrix = TermMatrix()
+            totals = {2014: dict(), 2015: dict()}
+            for m in range(rng.randint(2, 5)):
+                filing = Filing("320193", str(m), rng.choice((2014, 2015)), "")
+                d = randomCounts(rng)
+                matrix.add(filing, d)
+                for word, count in d.items():
+                    totals[filing.year][word] = \
+                        totals[filing.year].get(word, 0) + count
+            # Both years must have a filing for the matrix to compare them
+            for year in (2014, 2015):
+                matrix.add(Filing("320193", str(year), year, ""), {"w0": 1})
+                totals[year]["w0"] = totals[year].get("w0", 0) + 1
+            k = rng.randint(1, 10)
+            risers, fallers = compareCounts(totals[2014], totals[2015], k)
+            self.assertEqual(risers, matrix.risers(2014, 2015, k))
+            self.assertEqual(fallers, matrix.fallers(2014, 2015, k))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# test_extract.py: Checks the parts of extract.py that decide what text gets
+# counted: splitting the parsed text into lines, cleaning the lines up and
+# finding the sections of the 10-K. Run with "python -m pytest" from the
+# folder above this one.
+
+import contextlib, io, random, re, unittest
+
+from secfilings.extract import extractSections, normalizeLine, textLines
+
+# originalNormalizeLine(): The step-by-step clean-up the program did before
+# normalizeLine() replaced it, which normalizeLine() must match exactly
+def originalNormalizeLine(line):
+    line = re.sub(r'[\u2002\u2003\u2007\u2008\u2009\u200A\u00A0/]', ' ', line)
+    line = line.strip()
+    line = re.sub(r'[\u2012\u2013\u2014\u2015\u2053]', '-', line)
+    line = "".join(c for c in line if c not in
+                   '!"#$%&\'()*+,./:;<=>?@[\\]^_`{|}~')
+    return "".join(c for c in line if ord(c) < 128)
+
+# The kinds of characters a line of report text is made of
+lineAlphabet = ("abcdefghijklmnopqrstuvwxyz" +
+                "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789" +
+                " \t-'\"!#$%&()*+,./:;<=>?@[\\]^_`{|}~" +
+                "\u2002\u2003\u2007\u2008\u2009\u200A\u00A0" +
+                "\u2012\u2013\u2014\u2015\u2053" +
+                "\u00E9\u2019\u201C\u201D\u2022\u00AE\u2122\u3000\u2028" +
+                "\U0001F600\U00010348")
+
+# quietly(): Runs a function without letting it print
+def quietly(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+class NormalizeLineTest(unittest.TestCase):
+    def check(self, line):
+        self.assertEqual(normalizeLine(line), originalNormalizeLine(line),
+                         repr(line))
+
+    def testSpecialCharacters(self):
+        for line in ("Risk\u00A0Factors", "supply\u2014chain", "and/or",
+                     "\u00A0\u00A0Item\u00A01A.\u00A0\u00A0Risk Factors",
+                     "long\u2013term \u2012 \u2015 \u2053",
+                     "\u2002\u2003\u2007\u2008\u2009\u200A",
+                     "the Company\u2019s \u201Cproducts\u201D \u00AE\u2122",
+                     "growth \U0001F600 in \U00010348 emoji",
+                     "", "   ", "12", "-"):
+            self.check(line)
+
+    # The line is trimmed before anything is dropped, so spaces left next
+    # to dropped punctuation or non-ASCII characters stay put
+    def testTrimComesFirst(self):
+        for line in ("word ,", ", word", "word \u00E9", "\U0001F600 word",
+                     "\u3000word\u3000", "( word )", "word\u2028",
+                     "\u00A0/ word /\u00A0"):
+            self.check(line)
+        self.assertEqual(normalizeLine("word ,"), "word ")
+        self.assertEqual(normalizeLine("\u00A0word\u00A0"), "word")
+
+    def testRandomLines(self):
+        rng = random.Random(5)
+        for n in range(20000):
+            self.check("".join(rng.choice(lineAlphabet)
+                               for _ in range(rng.randint(0, 40))))
+
+class TextLinesTest(unittest.TestCase):
+    # What reading the whole text back from a file in text mode gives
+    def expected(self, text):
+        return io.TextIOWrapper(io.BytesIO(text.encode("utf-8")),
+                                encoding="utf-8").readlines()
+
+    def testLineEndingSplitAcrossPieces(self):
+        self.assertEqual(list(textLines(["one\r", "\ntwo\r", "three\r"])),
+                         ["one\n", "two\n", "three\n"])
+        self.assertEqual(list(textLines(["a\r", "", "\n", "b"])),
+                         ["a\n", "b"])
+
+    def testRandomPieces(self):
+        rng = random.Random(10)
+        for n in range(2000):
+            text = "".join(rng.choice("ab \r\n")
+                           for _ in range(rng.randint(0, 30)))
+            cuts = sorted(rng.randint(0, len(text))
+                          for _ in range(rng.randint(0, 5)))
+            pieces = [text[i:j] for i, j in zip([0] + cuts,
+                                                cuts + [len(text)])]
+            self.assertEqual(list(textLines(pieces)), self.expected(text),
+                             repr(pieces))
+
+# The cleaned-up lines of a small report, table of contents included
+reportLines = ["FORM 10-K", "PART I",
+               "Item 1 Business", "3", "Item 1A Risk Factors", "8",
+               "Item 1B Unresolved Staff Comments", "15",
+               "Item 7 Managements Discussion and Analysis of Financial " +
+               "Condition and Results of Operations", "20",
+               "Item 7A Quantitative and Qualitative Disclosures About " +
+               "Market Risk", "30",
+               "Item 1 Business", "The Company designs phones",
+               "Item 1A Risk Factors",
+               "Supply risk is high", "Competition risk is high",
+               "Item 1B Unresolved Staff Comments", "None",
+               "Item 7 Managements Discussion and Analysis of Financial " +
+               "Condition and Results of Operations",
+               "Net sales grew", "Item 7A Quantitative and Qualitative " +
+               "Disclosures About Market Risk", "Rates rose",
+               "Item 8 Financial Statements and Supplementary Data",
+               "Balance sheets"]
+
+class ExtractSectionsTest(unittest.TestCase):
+    def testTableOfContentsIsSkipped(self):
+        sections = quietly(extractSections, iter(reportLines), ["1A"], 1, 1)
+        text, words = sections["1A"]
+        self.assertEqual(text, "Supply risk is high\nCompetition risk is high")
+        self.assertEqual(words["risk"], 2)
+        self.assertEqual(words["high"], 2)
+
+    def testMissingSectionIsEmpty(self):
+        sections = quietly(extractSections, iter(reportLines[:12]), ["1A"],
+                           1, 1)
+        self.assertEqual(sections["1A"], ("", {}))
+
+    # A wrapped line of prose starting with a later Item's number isn't that
+    # Item's heading, so the section carries on past it
+    def testItemMentionedInProseDoesNotEndSection(self):
+        lines = ["Item 1A Risk Factors", "Results are described in Part II",
+                 "Item 7 of this Form 10-K under Liquidity",
+                 "Item 1B Unresolved Staff Comments", "None"]
+        text, words = quietly(extractSections, iter(lines), ["1A"], 1, 1)["1A"]
+        self.assertEqual(text, "\n".join(lines[1:3]))
+        # A heading whose title is on the next line still ends it
+        lines[3:4] = ["Item 1B", "Unresolved Staff Comments"]
+        text, words = quietly(extractSections, iter(lines), ["1A"], 1, 1)["1A"]
+        self.assertEqual(text, "\n".join(lines[1:3]))
+
+    # Finding several sections at once gives each the same text and counts
+    # as finding it on its own
+    def testSeveralSectionsMatchOneAtATime(self):
+        items = ["1", "1A", "1B", "7", "7A"]
+        together = quietly(extractSections, iter(reportLines), items, 1, 1)
+        for key in items:
+            alone = quietly(extractSections, iter(reportLines), [key], 1, 1)
+            self.assertEqual(together[key], alone[key], key)
+        self.assertEqual(together["7"][0], "Net sales grew")
+        self.assertEqual(together["1B"][0], "None")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+# test_fetch.py: Checks how fetch.py reads the list of filings to process
+# from a manifest. Run with "python -m pytest" from the folder above this
+# one.
+
+import os, tempfile, unittest
+
+from secfilings.fetch import Filing, readManifest
+
+template = "http://example.com/s?filingID={filing_id}&CIK={cik}"
+
+class ReadManifestTest(unittest.TestCase):
+    # read(): Writes a manifest to a temporary file and reads it back
+    def read(self, text):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "manifest.csv")
+            with open(path, "w", -1, "utf-8", newline="") as file:
+                file.write(text)
+            return readManifest(path, template)
+
+    def testRows(self):
+        filings = self.read("cik,filing_id,year,url\n" +
+                            " 320193 ,0001-07-1,2007,\n" +
+                            "320193,0001-08-1,2008,http://example.com/a\n")
+        self.assertEqual(filings, [
+            Filing("320193", "0001-07-1", 2007,
+                   "http://example.com/s?filingID=0001-07-1&CIK=320193"),
+            Filing("320193", "0001-08-1", 2008, "http://example.com/a")])
+
+    # Short rows and blank values are reported with their line number
+    # rather than failing with a TypeError or AttributeError
+    def testMissingValues(self):
+        for text, message in (("320193,0001-07-1\n", "line 2 has no year"),
+                              ("320193\n", "line 2 has no filing_id"),
+                              ("320193,0001-07-1,2007\n,0001-08-1,2008\n",
+                               "line 3 has no cik"),
+                              ("320193, ,2007\n", "line 2 has no filing_id"),
+                              ("320193,0001-07-1,soon\n",
+                               "line 2 has a bad year: 'soon'")):
+            with self.assertRaises(ValueError) as caught:
+                self.read("cik,filing_id,year\n" + text)
+            self.assertEqual(str(caught.exception), message)
+
+    def testMissingColumns(self):
+        with self.assertRaises(ValueError) as caught:
+            self.read("cik,year\n320193,2007\n")
+        self.assertEqual(str(caught.exception), "missing column(s) filing_id")
+        with self.assertRaises(ValueError):
+            self.read("cik,filing_id,year\n")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# test_index.py: Checks that the search index in index.py finds exactly the
+# words and phrases a plain scan of the indexed text finds, and that
+# reindexing a report replaces what was indexed for it before. Run with
+# "python -m pytest" from the folder above this one.
+
+import os, random, tempfile, unittest
+
+from secfilings.fetch import Filing
+from secfilings.index import SearchIndex
+
+# The words the generated reports are made of. Few enough that phrases of
+# several words, repeated words included, turn up by chance.
+words = ["risk", "supply", "the", "company", "may", "not", "be", "able",
+         "to", "market", "risks", "a"]
+
+# scan(): Finds a phrase by reading through each report's words, returning
+# the same (cik, filing ID, year, starts) tuples as the index, minus the
+# document number
+def scan(texts, phrase, firstYear=None, lastYear=None):
+    phrase = phrase.lower().split()
+    results = []
+    for filing, text in texts.items():
+        if (firstYear is not None and filing.year < firstYear) or \
+                (lastYear is not None and filing.year > lastYear):
+            continue
+        text = text.lower().split()
+        starts = [i for i in range(len(text) - len(phrase) + 1)
+                  if text[i:i + len(phrase)] == phrase]
+        if starts:
+            results.append((filing.cik, filing.filingID, filing.year, starts))
+    results.sort(key = lambda x: (x[2], x[0], x[1]))
+    return results
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(os.path.join(self.folder.name,
+                                              "index.sqlite"))
+
+    def tearDown(self):
+        self.index.close()
+        self.folder.cleanup()
+
+    # search(): The index's results for a phrase, minus the document number
+    def search(self, phrase, firstYear=None, lastYear=None):
+        return [(cik, filingID, year, starts) for cik, filingID, year, doc,
+                starts in self.index.search(phrase, firstYear, lastYear)]
+
+    def testMatchesScan(self):
+        rng = random.Random(14)
+        texts = dict()
+        for n in range(12):
+            filing = Filing(str(320193 + n % 2), "0001-%02d-%d" % (n, n),
+                            2007 + n % 5, "")
+            # Each report uses only some of the words, so the rarest word of
+            # a phrase can be any of them. Sections are lines of text, so
+            # phrases can run from the end of one line onto the next.
+            used = rng.sample(words, rng.randint(3, len(words)))
+            texts[filing] = "\n".join(
+                " ".join(rng.choice(used) for _ in range(rng.randint(1, 12)))
+                for _ in range(rng.randint(5, 30)))
+            self.index.add(filing, "source", texts[filing])
+        for n in range(300):
+            phrase = " ".join(rng.choice(words)
+                              for _ in range(rng.randint(1, 4)))
+            years = sorted(rng.randint(2006, 2012) for _ in range(2))
+            self.assertEqual(self.search(phrase), scan(texts, phrase), phrase)
+            self.assertEqual(self.search(phrase, *years),
+                             scan(texts, phrase, *years), (phrase, years))
+
+    def testRepeatedWordsAndLineBreaks(self):
+        filing = Filing("320193", "0001-07-1", 2007, "")
+        self.index.add(filing, "source",
+                       "risk risk risk factors\nsupply\nchain risk")
+        self.assertEqual(self.search("risk risk"),
+                         [("320193", "0001-07-1", 2007, [0, 1])])
+        self.assertEqual(self.search("risk risk risk risk"), [])
+        self.assertEqual(self.search("factors supply chain"),
+                         [("320193", "0001-07-1", 2007, [3])])
+        # The phrase is cleaned up the same way the text was
+        self.assertEqual(self.search(" Supply, CHAIN "),
+                         [("320193", "0001-07-1", 2007, [4])])
+        # Matching starts from the rarest word, wherever it is in the phrase
+        self.index.add(Filing("320193", "0001-08-1", 2008, ""), "source",
+                       "risk risk factors")
+        self.assertEqual(self.search("risk risk factors"),
+                         [("320193", "0001-07-1", 2007, [1]),
+                          ("320193", "0001-08-1", 2008, [0])])
+        self.assertEqual(self.search("unknown"), [])
+        self.assertEqual(self.search("..."), [])
+
+    def testYearFilter(self):
+        for year in (2007, 2008, 2009):
+            self.index.add(Filing("320193", "0001-" + str(year), year, ""),
+                           "source", "supply chain")
+        self.assertEqual([year for cik, filingID, year, starts
+                          in self.search("supply chain", 2008)], [2008, 2009])
+        self.assertEqual([year for cik, filingID, year, starts
+                          in self.search("supply chain", 2008, 2008)], [2008])
+        self.assertEqual([year for cik, filingID, year, starts
+                          in self.search("supply chain", None, 2008)],
+                         [2007, 2008])
+        self.assertEqual(self.search("supply chain", 2010), [])
+
+    # A report is reindexed only when its source changes, and reindexing
+    # leaves nothing of the old text behind
+    def testReindexReplacesPostings(self):
+        filing = Filing("320193", "0001-07-1", 2007, "")
+        self.assertFalse(self.index.current(filing, "old"))
+        self.index.add(filing, "old", "supply chain risk")
+        self.assertTrue(self.index.current(filing, "old"))
+        self.assertFalse(self.index.current(filing, "new"))
+        self.index.add(filing._replace(year=2008), "new",
+                       "market risk\nsupply")
+        self.assertTrue(self.index.current(filing, "new"))
+        self.assertEqual(self.search("supply chain"), [])
+        self.assertEqual(self.search("risk supply"),
+                         [("320193", "0001-07-1", 2008, [1])])
+        self.assertEqual(self.search("market risk", 2007, 2007), [])
+        (doc,) = [row[3] for row in self.index.search("market")]
+        self.assertEqual(self.index.context(doc, -5, 10),
+                         "market risk supply")
+        self.assertEqual(self.index.db.execute(
+            "SELECT COUNT(*) FROM postings WHERE doc = ?", (doc,)).fetchone(),
+            (3,))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+# test_ledger.py: Checks the job ledger in ledger.py: how a filing's entry
+# changes from state to state, and where a run picks up each filing an
+# earlier run left behind. Run with "python -m pytest" from the folder above
+# this one.
+
+import os, tempfile, unittest
+
+from secfilings.cache import FilingCache
+from secfilings.fetch import Filing
+from secfilings.ledger import Ledger, resumeStep
+
+filing = Filing("320193", "0001-07-1", 2007, "http://example.com/a")
+counts = {"1A": {"risk": 2, "supply": 1}, "7": {"sale": 3}}
+
+class LedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "ledger.sqlite")
+        self.ledger = Ledger(self.path)
+
+    def tearDown(self):
+        self.ledger.close()
+        self.folder.cleanup()
+
+    # row(): The error and attempts recorded for a filing
+    def row(self, filing):
+        return self.ledger.db.execute(
+            "SELECT error, attempts FROM filings WHERE cik = ? AND " +
+            "filing_id = ?", (filing.cik, filing.filingID)).fetchone()
+
+    def testLookupRoundTrip(self):
+        self.assertIsNone(self.ledger.lookup(filing))
+        self.ledger.update(filing, "counted", "abc", "v1", counts)
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("counted", "abc", "v1", counts))
+        # Filings are told apart by CIK as well as filing ID
+        self.assertIsNone(self.ledger.lookup(filing._replace(cik="1")))
+        # and what's recorded survives closing the ledger
+        self.ledger.close()
+        self.ledger = Ledger(self.path)
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("counted", "abc", "v1", counts))
+
+    def testStateTransitions(self):
+        self.ledger.update(filing, "fetched", "abc")
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("fetched", "abc", None, None))
+        self.ledger.update(filing, "counted", "abc", "v1", counts)
+        # A failure keeps the hash, settings and counts already recorded,
+        # and each one adds an attempt
+        self.ledger.update(filing, "failed", error="timed out")
+        self.ledger.update(filing, "failed", error="refused")
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("failed", "abc", "v1", counts))
+        self.assertEqual(self.row(filing), ("refused", 2))
+        # Success clears the error but not the number of attempts
+        self.ledger.update(filing, "fetched", "def")
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("fetched", "def", "v1", counts))
+        self.assertEqual(self.row(filing), (None, 2))
+        self.ledger.update(filing, "counted", "def", "v2", {"1A": {}})
+        self.ledger.exported([filing])
+        self.assertEqual(self.ledger.lookup(filing),
+                         ("exported", "def", "v2", {"1A": {}}))
+
+class ResumeStepTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = FilingCache(self.folder.name, 1 << 20)
+        self.digest = self.cache.store(filing.filingID, filing.url,
+                                       b"<html></html>", None, None)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def step(self, entry, items=("1A",), revalidate=False):
+        return resumeStep(entry, "v1", list(items), self.cache, revalidate)
+
+    def testCounted(self):
+        for state in ("counted", "exported"):
+            entry = (state, self.digest, "v1", counts)
+            self.assertEqual(self.step(entry), "reuse")
+            self.assertEqual(self.step(entry, ["1A", "7"]), "reuse")
+            # A section that wasn't counted means starting again
+            self.assertEqual(self.step(entry, ["1A", "1B"]), "download")
+            # as do other analysis settings or --revalidate
+            self.assertEqual(self.step((state, self.digest, "v0", counts)),
+                             "download")
+            self.assertEqual(self.step(entry, revalidate=True), "download")
+
+    def testFetched(self):
+        entry = ("fetched", self.digest, None, None)
+        self.assertEqual(self.step(entry), "analyze")
+        self.assertEqual(self.step(entry, revalidate=True), "download")
+        # Once its HTML has been evicted from the cache, it's downloaded
+        os.remove(self.cache.pagePath(self.digest))
+        self.assertEqual(self.step(entry), "download")
+
+    def testFailedAndUnknown(self):
+        self.assertEqual(self.step(None), "download")
+        self.assertEqual(self.step(("failed", self.digest, "v1", counts)),
+                         "download")
+        self.assertEqual(self.step(("failed", None, None, None)), "download")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+# test_service.py: Checks the "serve" command's HTTP service in service.py
+# by running it in this process on a free port. Its filing cache is seeded
+# with two small reports and it never goes online, so nothing is
+# downloaded. Run with "python -m pytest" from the folder above this one.
+
+import argparse, json, os, tempfile, threading, unittest
+from http.client import HTTPConnection
+
+from secfilings.cache import FilingCache
+from secfilings.count import compareCounts, topWords
+from secfilings.fetch import Filing, HostRateLimiter, urlKey
+from secfilings.ledger import Ledger
+from secfilings.service import AnalysisService, ServiceServer
+from secfilings.tokenize import analysisSettings
+
+# reportHTML(): A small 10-K, table of contents included, with the given
+# lines of Risk Factors and MD&A text
+def reportHTML(risks, discussion):
+    headings = ["Item 1A. Risk Factors", "Item 1B. Unresolved Staff Comments",
+                "Item 7. Management\u2019s Discussion and Analysis of " +
+                "Financial Condition and Results of Operations",
+                "Item 7A. Quantitative and Qualitative Disclosures About " +
+                "Market Risk"]
+    lines = ["FORM 10-K", "PART I"]
+    for page, heading in enumerate(headings):
+        lines.extend([heading, str(page * 10 + 5)])
+    lines.extend([headings[0]] + risks + [headings[1], "None."] +
+                 [headings[2]] + discussion +
+                 [headings[3], "Interest rates rose.",
+                  "Item 8. Financial Statements and Supplementary Data",
+                  "Balance sheets."])
+    return bytes("<html><body>\n" + "".join("<p>" + line + "</p>\n"
+                                          for line in lines) +
+                 "</body></html>", "utf-8")
+
+# The filings the service knows about. The ones from 2014 and 2015 are in
+# the cache; the one from 2013 isn't and can't be downloaded.
+filings = [Filing("320193", "0001-13-1", 2013, "http://example.invalid/13"),
+           Filing("320193", "0001-14-1", 2014, "http://example.invalid/14"),
+           Filing("320193", "0001-15-1", 2015, "http://example.invalid/15")]
+reports = {filings[1]: reportHTML(["Supply shortages are a risk.",
+                                   "Competition is a risk to supply."],
+                                  ["Net sales grew on strong demand."]),
+           filings[2]: reportHTML(["Competition is intense.",
+                                   "Supply risk remains.",
+                                   "Litigation risk grew."],
+                                  ["Net sales fell on weak demand."])}
+
+class ServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = FilingCache(os.path.join(self.folder.name, "cache"),
+                                 1 << 20)
+        for filing, html in reports.items():
+            self.cache.store(filing.filingID, filing.url, html, None, None)
+        self.server = None
+        self.start()
+
+    def tearDown(self):
+        self.stop()
+        self.folder.cleanup()
+
+    # start(): Starts a service with nothing in memory, sharing the cache
+    # and ledger with any service started before it
+    def start(self):
+        args = argparse.Namespace(revalidate=False, offline=True, retries=0,
+                                  backoff=0.0, timeout=1.0, memory_size=10,
+                                  lemma_cache=None)
+        ledger = Ledger(os.path.join(self.folder.name, "ledger.sqlite"), True)
+        self.service = AnalysisService(filings, self.cache, ledger,
+                                       analysisSettings(), ["1A"],
+                                       HostRateLimiter(0), args)
+        self.server = ServiceServer(("127.0.0.1", 0), self.service)
+        # Requests aren't logged to the console
+        self.server.RequestHandlerClass.log_message = lambda *args: None
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.service.close()
+            self.server = None
+
+    # request(): Sends a request to the service and returns the status and
+    # the JSON answer. A body that isn't a string is sent as JSON.
+    def request(self, method, path, body=None, headers={}):
+        connection = HTTPConnection("127.0.0.1",
+                                    self.server.server_address[1], timeout=30)
+        if body is not None and not isinstance(body, (str, bytes)):
+            body = json.dumps(body)
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        result = json.loads(response.read().decode("utf-8"))
+        connection.close()
+        self.assertIn("milliseconds", result)
+        return response.status, result
+
+    # Word counts come from analysis the first time, then from memory, and
+    # from the ledger once a new service has started
+    def testAnswerSources(self):
+        query = {"year": 2014, "sections": ["1A", "7"], "top": 3}
+        status, first = self.request("POST", "/analyze", query)
+        self.assertEqual(status, 200)
+        self.assertEqual(first["source"], "analysis")
+        self.assertEqual(first["filing_id"], "0001-14-1")
+        self.assertEqual(first["sections"]["1A"]["top"],
+                         [["supply", 2], ["risk", 2], ["shortage", 1]])
+        self.assertEqual(first["sections"]["7"]["words"], 5)
+        status, second = self.request("POST", "/analyze", query)
+        self.assertEqual(second["source"], "memory")
+        self.assertEqual(second["sections"], first["sections"])
+        self.stop()
+        self.start()
+        status, third = self.request("POST", "/analyze", query)
+        self.assertEqual(third["source"], "ledger")
+        self.assertEqual(third["sections"], first["sections"])
+        status, result = self.request("GET", "/")
+        self.assertEqual(result["answered_from"],
+                         {"memory": 0, "ledger": 1, "analysis": 0})
+        self.assertEqual(result["in_memory"], 1)
+
+    def testCountsAndCompare(self):
+        counts = dict()
+        for filing in filings[1:]:
+            status, result = self.request("GET", "/counts?filing_id=" +
+                                          filing.filingID + "&section=1A")
+            self.assertEqual(status, 200)
+            # Most frequent first, in the order topWords() gives
+            d = counts[filing.year] = dict(result["counts"])
+            self.assertEqual(result["counts"],
+                             [list(x) for x in topWords(d, len(d))])
+        status, result = self.request("GET", "/counts?year=2015&top=2")
+        self.assertEqual(result["counts"], [["risk", 2], ["competition", 1]])
+        status, result = self.request("GET",
+                                      "/compare?from=2014&to=2015&top=3")
+        self.assertEqual(status, 200)
+        risers, fallers = compareCounts(counts[2014], counts[2015], 3)
+        self.assertEqual(result["risers"], [list(x) for x in risers])
+        self.assertEqual(result["fallers"], [list(x) for x in fallers])
+        self.assertEqual(result["from"], {"year": 2014,
+                                          "filings": ["0001-14-1"],
+                                          "failed": []})
+
+    def testErrors(self):
+        for method, path, body, status, message in (
+                ("GET", "/nowhere", None, 404, "there is nothing at /nowhere"),
+                ("GET", "/analyze", None, 405, "use POST for /analyze"),
+                ("POST", "/counts", None, 405, "use GET for /counts"),
+                ("GET", "/counts", None, 400, "give a filing_id or a year"),
+                ("GET", "/counts?year=1999", None, 404,
+                 "there is no filing from 1999"),
+                ("GET", "/counts?year=soon", None, 400,
+                 "parameter 'year' must be a whole number"),
+                ("GET", "/counts?year=2014&top=many", None, 400,
+                 "parameter 'top' must be a whole number"),
+                ("GET", "/counts?year=2014&section=1A,7", None, 400,
+                 "give a single section"),
+                ("GET", "/counts?cik=1&filing_id=0001-14-1", None, 404,
+                 "there is no filing 0001-14-1 for CIK 1"),
+                ("POST", "/analyze", "{not json", 400,
+                 "the request body isn't valid JSON"),
+                ("POST", "/analyze", "[2014]", 400,
+                 "the request body must be a JSON object"),
+                ("POST", "/analyze", {"url": "file:///etc/passwd",
+                                      "year": 2015}, 400,
+                 "url must be an http or https address"),
+                ("GET", "/compare?from=2014", None, 400,
+                 "missing parameter 'to'")):
+            answer = self.request(method, path, body)
+            self.assertEqual(answer, (status, {"error": message,
+                                               "milliseconds":
+                                               answer[1]["milliseconds"]}),
+                             (method, path))
+        status, result = self.request("POST", "/analyze", "{}",
+                                      {"Content-Length": "many"})
+        self.assertEqual(status, 400)
+        # Filings that can't be downloaded are reported as a bad gateway
+        # and recorded in the ledger as failed
+        status, result = self.request("POST", "/analyze", {"year": 2013})
+        self.assertEqual(status, 502)
+        self.assertIn("could not download filing 0001-13-1", result["error"])
+        self.assertEqual(self.service.ledger.lookup(filings[0])[0], "failed")
+        status, result = self.request("GET", "/compare?from=2013&to=2015")
+        self.assertEqual(status, 502)
+        self.assertIn("none of the filings from 2013", result["error"])
+
+    # A filing given by url is named by a hash of the url, and only listed
+    # once its words are counted
+    def testAnalyzeURL(self):
+        url = "http://example.invalid/report?filingID=0001-14-1"
+        query = {"url": url, "year": 2016, "cik": "42"}
+        status, result = self.request("POST", "/analyze", query)
+        self.assertEqual(status, 502)
+        status, result = self.request("GET", "/filings")
+        self.assertEqual(len(result["filings"]), 3)
+        self.cache.store(urlKey(url), url, reports[filings[2]], None, None)
+        status, result = self.request("POST", "/analyze", query)
+        self.assertEqual(status, 200)
+        self.assertEqual(result["filing_id"], urlKey(url))
+        status, result = self.request("GET", "/filings")
+        self.assertEqual([(f["cik"], f["filing_id"], f["in_memory"])
+                          for f in result["filings"][2:]],
+                         [("320193", "0001-15-1", False),
+                          ("42", urlKey(url), True)])
+        # The filing it named by ID is left alone
+        status, result = self.request("GET", "/counts?filing_id=0001-14-1")
+        self.assertEqual(dict(result["counts"])["shortage"], 1)
+
+if __name__ == "__main__":
+    unittest.main()